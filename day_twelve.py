@@ -16,16 +16,36 @@ The algorithm uses backtracking:
 4. If no valid placement exists, backtrack and try next position
 
 Usage:
-    python3 solve.py input.txt
+    python3 day_twelve.py                 # reads day_twelve_input.txt
+    python3 day_twelve.py input.txt --jobs 8
     # or
-    cat input.txt | python3 solve.py
+    cat input.txt | python3 day_twelve.py -
     
 For RStudio: All print statements use flush=True for real-time output.
 """
 
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import math
+import mmap
+import random
+import sqlite3
+import struct
 import sys
 import time
-from typing import List, Dict, Set, Tuple, FrozenSet
+from collections import OrderedDict
+from enum import Enum
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import List, Dict, Set, Tuple, FrozenSet, NamedTuple, Optional
+
+Orientations = Dict[int, List[FrozenSet[Tuple[int, int]]]]
+
+# A packing found by an engine: (shape_id, cell mask) per placed piece
+Solution = List[Tuple[int, int]]
 
 
 def log(msg=""):
@@ -144,21 +164,320 @@ def get_all_orientations(coords: Set[Tuple[int, int]]) -> List[FrozenSet[Tuple[i
     return list(orientations)
 
 
-def solve_region(width: int, height: int, shapes_to_place: List[int],
-                 all_orientations: Dict[int, List[FrozenSet[Tuple[int, int]]]],
-                 region_num: int, verbose: bool = True) -> bool:
+class Verdict(Enum):
     """
-    Determine if all shapes can be placed in a region using backtracking.
+    Outcome of checking a region: the shapes fit, they cannot fit, or the
+    search ran out of budget before deciding.
     """
-    if not shapes_to_place:
-        return True
+    YES = "yes"
+    NO = "no"
+    UNKNOWN = "unknown"
+
+
+class SearchBudgetExceeded(Exception):
+    """
+    Raised by SearchMonitor.tick when a search runs past its time or node
+    budget.
+    """
+
+
+class SearchMonitor:
+    """
+    Count placement attempts, print a progress line every few seconds and
+    enforce the optional wall-clock and attempt budgets. Engines also keep
+    the counters that apply to them:
+
+    - `nodes`: pieces actually put down (exact engines)
+    - `tt_hits`, `tt_misses`: transposition table lookups (bitboard)
+    - `backjumps`: levels jumped over when backjumping (bitboard)
+    - `nogood_hits`: branches cut by a learned nogood (bitboard)
+    - `restarts`: restarts made under the Luby schedule (bitboard)
+    """
+
+    def __init__(self, total_shapes: int, verbose: bool = True,
+                 interval: float = 5.0, time_limit: Optional[float] = None,
+                 node_limit: Optional[int] = None):
+        self.attempts = 0
+        self.nodes = 0
+        self.tt_hits = 0
+        self.tt_misses = 0
+        self.backjumps = 0
+        self.nogood_hits = 0
+        self.restarts = 0
+        self.total_shapes = total_shapes
+        self.verbose = verbose
+        self.interval = interval
+        self.start_time = time.time()
+        self.last_update = self.start_time
+        self.deadline = None if time_limit is None else self.start_time + time_limit
+        self.node_limit = float("inf") if node_limit is None else node_limit
+
+    def tick(self, shape_index: int):
+        self.attempts += 1
+        if self.attempts > self.node_limit:
+            raise SearchBudgetExceeded("node limit")
+        
+        # The clock is only read every 4096 attempts, since time.time()
+        # costs more than a placement check
+        if self.attempts & 0xFFF:
+            return
+        if self.deadline is None and not self.verbose:
+            return
+        
+        now = time.time()
+        if self.deadline is not None and now > self.deadline:
+            raise SearchBudgetExceeded("time limit")
+        
+        # Print progress every few seconds
+        if self.verbose and now - self.last_update > self.interval:
+            log(f"      ... still working: {self.attempts:,} placements tried, "
+                f"placing shape {shape_index + 1}/{self.total_shapes}, "
+                f"{now - self.start_time:.1f}s elapsed")
+            self.last_update = now
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
     
-    grid = [[False] * width for _ in range(height)]
+    def time_left(self) -> Optional[float]:
+        """
+        Seconds until the deadline, or None without one. Raises
+        SearchBudgetExceeded once it has passed, so engines that hand work
+        to nested searches can check it between them and pass the rest on.
+        """
+        if self.deadline is None:
+            return None
+        left = self.deadline - time.time()
+        if left <= 0:
+            raise SearchBudgetExceeded("time limit")
+        return left
+    
+    def nodes_left(self) -> Optional[int]:
+        """
+        Placement attempts left in the node budget, or None without one.
+        Raises SearchBudgetExceeded once it is used up, like time_left.
+        """
+        if self.node_limit == float("inf"):
+            return None
+        left = self.node_limit - self.attempts
+        if left <= 0:
+            raise SearchBudgetExceeded("node limit")
+        return left
+    
+    def exhausted(self) -> bool:
+        """
+        Whether the time or node budget has run out, for engines that need
+        to tell a nested search giving up on its own budget from one cut
+        short by theirs.
+        """
+        return (self.attempts >= self.node_limit
+                or self.deadline is not None and time.time() > self.deadline)
+    
+    def counters(self) -> str:
+        """
+        The engine-specific counters that were used, for the end-of-search
+        log line.
+        """
+        text = ""
+        if self.nodes:
+            text += f", {self.nodes:,} pieces placed"
+        if self.tt_hits or self.tt_misses:
+            text += (f", transposition table {self.tt_hits:,} hits / "
+                     f"{self.tt_misses:,} misses")
+        if self.backjumps or self.nogood_hits:
+            text += (f", {self.backjumps:,} backjumps, "
+                     f"{self.nogood_hits:,} nogood hits")
+        if self.restarts:
+            text += f", {self.restarts:,} restarts"
+        return text
+
+
+class SearchOptions(NamedTuple):
+    """
+    Switches shared by the search engines. An engine ignores the ones that
+    do not apply to it.
+
+    `symmetry` restricts the first placement of the first (largest) shape
+    to one representative per rotation/reflection class of the board.
+    `dead_space` lets the bitboard and cell engines cut branches that wall
+    off more unusable empty cells than the region can spare (None: on for
+    bitboard, off for cell).
+    `forward_check` lets the bitboard engine cut branches where some shape
+    type can no longer reach enough cells for its remaining copies (None:
+    on).
+    `ordering` picks the bitboard engine's piece order from ORDERINGS.
+    `transposition` caps the bitboard engine's table of failed states in
+    entries (0: no table) and `transposition_policy` picks what it evicts
+    from TRANSPOSITION_POLICIES.
+    `backjump` makes the bitboard engine jump back to the piece a failure
+    is down to and learn nogoods from it (static ordering only).
+    `restarts` runs the bitboard engine under a Luby restart schedule,
+    shuffling the search order from `seed` after the first run; the
+    anneal engine draws its moves from `seed` too.
+    """
+    symmetry: bool = True
+    # None lets each engine use its own default
+    dead_space: Optional[bool] = None
+    forward_check: Optional[bool] = None
+    ordering: str = "static"
+    transposition: int = 0
+    transposition_policy: str = "lru"
+    backjump: bool = False
+    restarts: bool = False
+    seed: int = 0
+
+
+# Piece orderings for the bitboard engine: "static" places the shapes in
+# the order given, "mrv" always continues with the shape type that has the
+# fewest placements left that do not overlap the board
+ORDERINGS = ("static", "mrv")
+
+# The table is only used for states with at least this many pieces left
+TRANSPOSITION_MIN_LEFT = 3
+
+# What the transposition table drops once full: "lru" the least recently
+# used state, "depth" the deeper half of the states, whose subtrees are
+# the cheapest to search again
+TRANSPOSITION_POLICIES = ("lru", "depth")
+
+# Learned nogoods the backjumping search keeps per level, newest first out
+# of the scan once full
+NOGOOD_LIMIT = 64
+
+# Placement attempts in a unit of the restart schedule: run k of a search
+# with restarts may use RESTART_UNIT * luby(k) of them
+RESTART_UNIT = 2_000
+
+# Fixed seed, so Zobrist keys and with them table collisions are the same
+# from run to run
+ZOBRIST_SEED = 12
+
+
+def luby(i: int) -> int:
+    """
+    The i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    """
+    while True:
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+        if (1 << k) - 1 == i:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+def group_copies(shapes_to_place: List[int]) -> List[int]:
+    """
+    Reorder shapes so identical copies are adjacent, keeping the order in
+    which each shape first appears.
+
+    The engines place adjacent copies of a shape in increasing placement
+    order, so each multiset of positions is tried once instead of once per
+    permutation of the identical pieces.
+    """
+    counts: Dict[int, int] = {}
+    for shape_id in shapes_to_place:
+        counts[shape_id] = counts.get(shape_id, 0) + 1
+    return [shape_id for shape_id, quantity in counts.items() for _ in range(quantity)]
+
+
+def board_symmetries(width: int, height: int) -> List:
+    """
+    Cell maps (r, c) -> (r, c) for the symmetry group of a width x height
+    board. A rectangle has 4 symmetries (identity, two mirrors, half
+    turn); a square also has the two diagonal mirrors and the quarter
+    turns, 8 in all.
+    """
+    maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (height - 1 - r, c),
+        lambda r, c: (r, width - 1 - c),
+        lambda r, c: (height - 1 - r, width - 1 - c),
+    ]
+    if width == height:
+        maps += [
+            lambda r, c: (c, r),
+            lambda r, c: (width - 1 - c, height - 1 - r),
+            lambda r, c: (c, height - 1 - r),
+            lambda r, c: (width - 1 - c, r),
+        ]
+    return maps
+
+
+def symmetry_order(width: int, height: int,
+                   orientations: List[FrozenSet[Tuple[int, int]]]) -> Tuple[List[int], int]:
+    """
+    Order a shape's placements so one representative of each
+    board-symmetry orbit comes first.
+
+    Placements are numbered orientation by orientation, then row-major by
+    offset (the order used by the engines). Returns (order,
+    num_representatives): the first `num_representatives` entries of
+    `order` are the lowest-numbered member of each orbit. Every packing
+    can be mirrored/rotated so that some copy of a given shape uses a
+    representative; with copies placed in increasing order, restricting
+    the first copy to the representatives therefore loses no solutions
+    while skipping up to 8 equivalent ones.
+    """
+    transforms = board_symmetries(width, height)[1:]
+    orientation_index = {o: k for k, o in enumerate(orientations)}
     
-    # Track progress
-    attempts = [0]
-    start_time = time.time()
-    last_update = [start_time]
+    # Numbering of placements: block start and row length per orientation
+    blocks = []
+    start = 0
+    for orientation in orientations:
+        rows = height - max(r for r, c in orientation)
+        cols = width - max(c for r, c in orientation)
+        blocks.append((start, rows, cols))
+        start += rows * cols
+    
+    # A board symmetry is affine, so orientation k at offset (r, c) maps to
+    # orientation k2 at offset base + T(r, c) - T(0, 0)
+    images = []
+    for transform in transforms:
+        zero_r, zero_c = transform(0, 0)
+        per_orientation = []
+        for orientation in orientations:
+            cells = [transform(r, c) for r, c in orientation]
+            min_r = min(r for r, c in cells)
+            min_c = min(c for r, c in cells)
+            k2 = orientation_index[normalize(set(cells))]
+            per_orientation.append((k2, min_r - zero_r, min_c - zero_c))
+        images.append((transform, per_orientation))
+    
+    seen = [False] * start
+    representatives = []
+    others = []
+    for k, (block_start, rows, cols) in enumerate(blocks):
+        for start_r in range(rows):
+            for start_c in range(cols):
+                i = block_start + start_r * cols + start_c
+                if seen[i]:
+                    others.append(i)
+                    continue
+                representatives.append(i)
+                seen[i] = True
+                for transform, per_orientation in images:
+                    k2, base_r, base_c = per_orientation[k]
+                    tr, tc = transform(start_r, start_c)
+                    block2, _, cols2 = blocks[k2]
+                    seen[block2 + (base_r + tr) * cols2 + base_c + tc] = True
+    
+    return representatives + others, len(representatives)
+
+
+def solve_region_grid(width: int, height: int, shapes_to_place: List[int],
+                      all_orientations: Dict[int, List[FrozenSet[Tuple[int, int]]]],
+                      table: Optional["PlacementTable"],
+                      monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Backtracking search over a list-of-lists boolean grid.
+
+    Copies of the same shape are placed in increasing position order.
+    With `options.symmetry`, the first copy of the first shape is limited
+    to one representative per board-symmetry class. Returns the placed
+    pieces, or None if they cannot all fit.
+    """
+    grid = [[False] * width for _ in range(height)]
     
     def can_place(shape_coords: FrozenSet[Tuple[int, int]], 
                   start_r: int, start_c: int) -> bool:
@@ -181,181 +500,3297 @@ def solve_region(width: int, height: int, shapes_to_place: List[int],
         for r, c in shape_coords:
             grid[start_r + r][start_c + c] = occupied
     
-    def backtrack(shape_index: int) -> bool:
-        if shape_index >= len(shapes_to_place):
+    sequence = group_copies(shapes_to_place)
+    
+    # Every (orientation, start_r, start_c) of each shape, in search order
+    positions = {}
+    for shape_id in set(sequence):
+        positions[shape_id] = [
+            (orientation, start_r, start_c)
+            for orientation in all_orientations[shape_id]
+            for start_r in range(height - max(r for r, c in orientation))
+            for start_c in range(width - max(c for r, c in orientation))
+        ]
+    
+    first_limit = None
+    if options.symmetry and sequence:
+        first = positions[sequence[0]]
+        order, first_limit = symmetry_order(width, height,
+                                            all_orientations[sequence[0]])
+        positions[sequence[0]] = [first[i] for i in order]
+    
+    path = []
+    
+    def backtrack(shape_index: int, start: int) -> bool:
+        if shape_index >= len(sequence):
             return True
         
-        shape_id = shapes_to_place[shape_index]
+        shape_id = sequence[shape_index]
+        shape_positions = positions[shape_id]
+        
+        # The next copy of the same shape must go after this one
+        same_next = (shape_index + 1 < len(sequence)
+                     and sequence[shape_index + 1] == shape_id)
+        end = len(shape_positions)
+        if shape_index == 0 and first_limit is not None:
+            end = first_limit
         
-        for orientation in all_orientations[shape_id]:
-            max_r = max(r for r, c in orientation)
-            max_c = max(c for r, c in orientation)
+        for i in range(start, end):
+            orientation, start_r, start_c = shape_positions[i]
+            monitor.tick(shape_index)
             
-            for start_r in range(height - max_r):
-                for start_c in range(width - max_c):
-                    attempts[0] += 1
-                    
-                    # Print progress every 5 seconds
-                    if verbose and time.time() - last_update[0] > 5.0:
-                        elapsed = time.time() - start_time
-                        log(f"      ... still working: {attempts[0]:,} placements tried, "
-                            f"placing shape {shape_index + 1}/{len(shapes_to_place)}, "
-                            f"{elapsed:.1f}s elapsed")
-                        last_update[0] = time.time()
-                    
-                    if can_place(orientation, start_r, start_c):
-                        place_shape(orientation, start_r, start_c, True)
-                        
-                        if backtrack(shape_index + 1):
-                            return True
-                        
-                        place_shape(orientation, start_r, start_c, False)
+            if can_place(orientation, start_r, start_c):
+                place_shape(orientation, start_r, start_c, True)
+                path.append((shape_id, orientation_mask(orientation, width)
+                             << (start_r * width + start_c)))
+                monitor.nodes += 1
+                
+                if backtrack(shape_index + 1, i + 1 if same_next else 0):
+                    return True
+                
+                path.pop()
+                place_shape(orientation, start_r, start_c, False)
         
         return False
     
-    result = backtrack(0)
+    return path if backtrack(0, 0) else None
+
+
+def orientation_mask(orientation: FrozenSet[Tuple[int, int]], width: int) -> int:
+    """
+    Convert a normalized orientation into a bitmask anchored at cell (0, 0).
+    Cell (r, c) of a region of the given width maps to bit r * width + c.
+    """
+    mask = 0
+    for r, c in orientation:
+        mask |= 1 << (r * width + c)
+    return mask
+
+
+def catalog_key(all_orientations: Orientations) -> Tuple:
+    """
+    Hashable, order-independent description of a shape catalog.
+    """
+    return tuple(
+        (shape_id, tuple(sorted(tuple(sorted(o)) for o in orientations)))
+        for shape_id, orientations in sorted(all_orientations.items())
+    )
+
+
+class PlacementTable:
+    """
+    Every legal (shape, orientation, offset) in a width x height region,
+    precomputed as a cell mask, plus an inverse index from cell to the
+    placements that cover it.
+
+    Placements of one shape are listed orientation by orientation, then
+    row-major by offset, which is the order the grid engine tries them in.
+    `masks` and `shape_of` are flat lists indexed by placement number;
+    the cell index is built on first use.
+    """
+
+    def __init__(self, width: int, height: int, all_orientations: Orientations):
+        self.width = width
+        self.height = height
+        self.all_orientations = all_orientations
+        self.masks: List[int] = []
+        self.shape_of: List[int] = []
+        self.by_shape: Dict[int, List[int]] = {}
+        self._by_cell: Optional[List[List[int]]] = None
+        self._symmetry: Dict[int, Tuple[List[int], int]] = {}
+        self._anchored: Optional[List[List[int]]] = None
+        self._column_anchored: Optional[List[List[int]]] = None
+        self._coverage: Dict[int, List[Tuple[int, List[int]]]] = {}
+        
+        self.full = (1 << (width * height)) - 1
+        first_col = sum(1 << (r * width) for r in range(height))
+        self._not_first_col = self.full & ~first_col
+        self._not_last_col = self.full & ~(first_col << (width - 1))
+        
+        for shape_id, orientations in sorted(all_orientations.items()):
+            first = len(self.masks)
+            for orientation in orientations:
+                max_r = max(r for r, c in orientation)
+                max_c = max(c for r, c in orientation)
+                base = orientation_mask(orientation, width)
+                self.masks.extend(base << (start_r * width + start_c)
+                                  for start_r in range(height - max_r)
+                                  for start_c in range(width - max_c))
+            self.shape_of.extend([shape_id] * (len(self.masks) - first))
+            self.by_shape[shape_id] = list(range(first, len(self.masks)))
+    
+    @property
+    def by_cell(self) -> List[List[int]]:
+        """
+        Placement indices covering each cell, built on first use.
+        """
+        if self._by_cell is None:
+            by_cell = [[] for _ in range(self.width * self.height)]
+            for index, mask in enumerate(self.masks):
+                while mask:
+                    low = mask & -mask
+                    by_cell[low.bit_length() - 1].append(index)
+                    mask ^= low
+            self._by_cell = by_cell
+        return self._by_cell
     
-    if verbose:
-        elapsed = time.time() - start_time
-        log(f"      Completed in {elapsed:.2f}s after {attempts[0]:,} placement attempts")
+    @property
+    def anchored(self) -> List[List[int]]:
+        """
+        Placement indices grouped by their anchor, the lowest-numbered
+        (top-left-most in row-major order) cell they cover. Built on first
+        use.
+        """
+        if self._anchored is None:
+            anchored = [[] for _ in range(self.width * self.height)]
+            for index, mask in enumerate(self.masks):
+                anchored[(mask & -mask).bit_length() - 1].append(index)
+            self._anchored = anchored
+        return self._anchored
+    
+    @property
+    def column_anchored(self) -> List[List[int]]:
+        """
+        Placement indices grouped by their anchor in column-major order,
+        the top cell of the leftmost column they cover, indexed by that
+        cell's usual row-major number. Built on first use.
+        """
+        if self._column_anchored is None:
+            column_anchored = [[] for _ in range(self.width * self.height)]
+            for index, mask in enumerate(self.masks):
+                anchor = None
+                while mask:
+                    low = mask & -mask
+                    r, c = divmod(low.bit_length() - 1, self.width)
+                    if anchor is None or (c, r) < anchor:
+                        anchor = (c, r)
+                    mask ^= low
+                column_anchored[anchor[1] * self.width + anchor[0]].append(index)
+            self._column_anchored = column_anchored
+        return self._column_anchored
+    
+    def grow(self, mask: int) -> int:
+        """
+        The mask plus its orthogonal neighbours, clipped to the board.
+        """
+        return (mask
+                | ((mask << 1) & self._not_first_col)
+                | ((mask >> 1) & self._not_last_col)
+                | ((mask << self.width) & self.full)
+                | (mask >> self.width))
     
-    return result
+    def component(self, seed: int, free: int, limit: Optional[int] = None) -> int:
+        """
+        The connected component of `free` cells containing `seed`. With a
+        `limit`, the fill stops early once it has more cells than that and
+        returns the partial component.
+        """
+        # grow() inlined: this is the inner loop of dead-space pruning.
+        # Masking with `free` also clips the row shifts to the board.
+        not_first_col = self._not_first_col
+        not_last_col = self._not_last_col
+        width = self.width
+        component = seed
+        while True:
+            grown = (component
+                     | ((component << 1) & not_first_col)
+                     | ((component >> 1) & not_last_col)
+                     | (component << width)
+                     | (component >> width)) & free
+            if grown == component:
+                return component
+            component = grown
+            if limit is not None and component.bit_count() > limit:
+                return component
+    
+    def masks_for(self, shape_id: int) -> List[int]:
+        return [self.masks[i] for i in self.by_shape[shape_id]]
+    
+    def symmetry_order(self, shape_id: int) -> Tuple[List[int], int]:
+        """
+        Placement indices of a shape with one representative per
+        board-symmetry orbit first, and the number of representatives.
+        """
+        if shape_id not in self._symmetry:
+            indices = self.by_shape[shape_id]
+            order, num_reps = symmetry_order(self.width, self.height,
+                                             self.all_orientations[shape_id])
+            self._symmetry[shape_id] = ([indices[i] for i in order], num_reps)
+        return self._symmetry[shape_id]
+    
+    def coverage(self, shape_id: int, free: int) -> int:
+        """
+        The `free` cells that some placement of the shape lying entirely in
+        `free` would cover. Works a whole orientation at a time: ANDing
+        `free` shifted by each cell's offset leaves the anchors where the
+        orientation fits, and ORing those back over its cells gives the
+        cells it can reach.
+        """
+        if shape_id not in self._coverage:
+            # (anchors that keep the orientation on the board, cell offsets)
+            self._coverage[shape_id] = [
+                (sum(1 << (r * self.width + c)
+                     for r in range(self.height - max(r for r, c in orientation))
+                     for c in range(self.width - max(c for r, c in orientation))),
+                 [r * self.width + c for r, c in orientation])
+                for orientation in self.all_orientations[shape_id]
+            ]
+        
+        covered = 0
+        for anchors, offsets in self._coverage[shape_id]:
+            for offset in offsets:
+                anchors &= free >> offset
+                if not anchors:
+                    break
+            else:
+                for offset in offsets:
+                    covered |= anchors << offset
+        return covered
 
 
-def solve(input_text: str) -> int:
+# Placement tables a cache keeps, least recently used out first; a table
+# for a region near 50x50 takes tens of megabytes
+PLACEMENT_TABLE_LIMIT = 8
+
+
+def get_placement_table(width: int, height: int, all_orientations: Orientations,
+                        cache: Optional[OrderedDict] = None) -> PlacementTable:
     """
-    Main solver function. Can be called from R with input text.
-    Returns the number of solvable regions.
+    Build the placement table for a region size, reusing a cached one when
+    the same dimensions and shape catalog have been seen before. The cache
+    holds at most PLACEMENT_TABLE_LIMIT tables.
     """
-    log()
-    log("*" * 60)
-    log("*  ELF PRESENT FITTING PUZZLE SOLVER                       *")
-    log("*" * 60)
-    log()
+    if cache is None:
+        return PlacementTable(width, height, all_orientations)
     
-    # Parse input
-    shapes_raw, regions = parse_input(input_text)
+    key = (width, height, catalog_key(all_orientations))
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    if len(cache) >= PLACEMENT_TABLE_LIMIT:
+        cache.popitem(last=False)
+    cache[key] = PlacementTable(width, height, all_orientations)
+    return cache[key]
+
+
+# Components up to this size are checked for whether any remaining
+# placement fits inside them; larger ones are assumed usable.
+DEAD_SPACE_FIT_LIMIT = 24
+
+
+def dead_cells(table: PlacementTable, free: int, seeds: int,
+               remaining: Dict[int, int], min_size: int,
+               fit_cache: Optional[Dict[Tuple[int, int], bool]] = None) -> int:
+    """
+    Mask of the free cells that can never be covered, among the connected
+    components of `free` that touch `seeds`.
+
+    A component is dead if it is smaller than the smallest remaining shape,
+    or if it is small and no placement of a remaining shape fits inside it.
+    Components only shrink as the search goes deeper, so a dead component
+    stays dead and callers can carry the mask down and only re-examine the
+    components next to the latest decision. `fit_cache` remembers, per
+    (component, set of remaining shapes), whether anything fits.
+    """
+    dead = 0
+    seeds &= free
+    anchored = table.anchored
+    available = sum(1 << shape_id for shape_id, left in remaining.items() if left)
+    while seeds:
+        # Large components are never dead, so the fill can stop early
+        component = table.component(seeds & -seeds, free, DEAD_SPACE_FIT_LIMIT)
+        seeds &= ~component
+        size = component.bit_count()
+        
+        if size < min_size:
+            dead |= component
+            continue
+        
+        if size <= DEAD_SPACE_FIT_LIMIT:
+            key = (component, available)
+            fits = fit_cache.get(key) if fit_cache is not None else None
+            if fits is None:
+                # A placement inside the component is anchored at one of its cells
+                outside = ~component
+                cells = component
+                fits = False
+                while cells and not fits:
+                    low = cells & -cells
+                    cells ^= low
+                    for index in anchored[low.bit_length() - 1]:
+                        if (available >> table.shape_of[index] & 1
+                                and not table.masks[index] & outside):
+                            fits = True
+                            break
+                if fit_cache is not None:
+                    fit_cache[key] = fits
+            if not fits:
+                dead |= component
     
-    # Display shapes
-    log("=" * 60)
-    log("ANALYZING SHAPES...")
-    log("=" * 60)
+    return dead
+
+
+def solve_region_bitboard(width: int, height: int, shapes_to_place: List[int],
+                          all_orientations: Orientations, table: PlacementTable,
+                          monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Backtracking search with the region stored as a single int bitmask.
+
+    Each placement in the table is a shifted mask, so a placement check is
+    a single `&` and placing/removing is a `^=`. The search visits
+    placements in the same order as the grid engine, including placing
+    copies of the same shape in increasing placement order and the
+    `symmetry` restriction on the first shape.
     
-    all_orientations = {}
-    for shape_id, shape_lines in shapes_raw.items():
-        coords = shape_to_coords(shape_lines)
-        orientations = get_all_orientations(coords)
-        all_orientations[shape_id] = orientations
-        
-        num_cells = len(coords)
-        log(f"  Shape {shape_id}: {num_cells} cells, {len(orientations)} unique orientations")
-    log()
+    Unless `options.dead_space` is False, each placement re-examines the
+    empty components next to it; once more cells are provably unusable
+    than the region's slack allows, the branch is cut.
     
-    # Process regions
-    log("=" * 60)
-    log("CHECKING REGIONS...")
-    log("=" * 60)
-    log()
+    Unless `options.forward_check` is False, each placement also bounds
+    what the remaining pieces can still reach (PlacementTable.coverage):
+    a type whose reachable cells are fewer than its remaining copies need,
+    or more free cells out of reach of every remaining type than the slack
+    allows, cuts the branch.
     
-    solvable_count = 0
-    total_regions = len(regions)
+    With `options.ordering` "mrv" the next piece is not taken from the
+    sequence but is a copy of the type with the fewest live placements
+    (ones not overlapping the board), kept up to date per cell as pieces
+    go on and come off; a type with fewer live placements than copies left
+    fails at once. The first piece is still the first shape, so the
+    symmetry restriction holds, and copies of a type still go down in
+    increasing placement order.
+    
+    With `options.transposition` set, failed states go in a transposition
+    table of at most that many entries, evicted by
+    `options.transposition_policy`. A state is the occupancy, the
+    remaining counts and the lowest placement index each type may still
+    use; it is found by a Zobrist hash kept up to date as pieces go
+    on and come off, and checked in full on a hit. A stored failure also
+    covers the same state with higher placement indices, which has fewer
+    options. Since copies already go down in a fixed order, few states are
+    reached twice and the table is off by default.
+    
+    With `options.backjump` (static ordering only, no transposition
+    table) a failed branch reports the levels whose pieces caused it: for
+    each placement that overlaps the board, the piece under its first
+    overlapping cell, and the previous copy when it set the lowest
+    placement index. Branches cut by dead space or forward checking blame
+    every piece so far. A level not in the conflict of its child returns
+    at once, jumping back to the deepest culprit. Each failed level also
+    learns a nogood, the cells of its culprits and its placement index
+    bound, and skips any later state with the same pieces left that
+    covers those cells with at least that bound.
+    
+    With `options.restarts` the search runs under the Luby schedule of
+    placement attempts (RESTART_UNIT * luby(k) for run k) and starts over
+    whenever a run uses up its share. The first run keeps the usual order;
+    each later one shuffles the order of same-size types and of each
+    type's placements with a random.Random(`options.seed`), keeping the
+    symmetry representatives first. Nogoods and transposition table
+    entries without a placement index bound carry over between runs. As
+    the runs keep growing, the search stays complete.
+    """
+    sequence = group_copies(shapes_to_place)
+    shifted_masks = {shape_id: table.masks_for(shape_id)
+                     for shape_id in set(sequence)}
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in shifted_masks}
+    remaining = {shape_id: sequence.count(shape_id) for shape_id in shifted_masks}
+    slack = width * height - sum(sizes[shape_id] for shape_id in sequence)
+    
+    first_limit = None
+    
+    def arrange(shuffler: Optional[random.Random]):
+        # Set the piece sequence and each type's placement order, shuffled
+        # if a shuffler is given
+        nonlocal sequence, first_limit
+        types = list(dict.fromkeys(sequence))
+        if shuffler is not None:
+            types.sort(key=lambda sid: (-sizes[sid], shuffler.random()))
+        sequence = [shape_id for shape_id in types for _ in range(counts[shape_id])]
+        for shape_id in types:
+            shifted_masks[shape_id] = table.masks_for(shape_id)
+        first_limit = None
+        if options.symmetry and sequence:
+            order, first_limit = table.symmetry_order(sequence[0])
+            shifted_masks[sequence[0]] = [table.masks[i] for i in order]
+        if shuffler is not None:
+            for shape_id, masks in shifted_masks.items():
+                split = first_limit if shape_id == sequence[0] and first_limit else 0
+                head, tail = masks[:split], masks[split:]
+                shuffler.shuffle(head)
+                shuffler.shuffle(tail)
+                shifted_masks[shape_id] = head + tail
+    
+    counts = dict(remaining)
+    arrange(None)
+    board = [0]
+    path = []
+    use_dead_space = options.dead_space is not False
+    use_forward_check = options.forward_check is not False
+    fit_cache = {}
+    
+    if options.transposition_policy not in TRANSPOSITION_POLICIES:
+        raise ValueError(f"Unknown transposition policy {options.transposition_policy!r}, "
+                         f"expected one of {TRANSPOSITION_POLICIES}")
+    tt_limit = options.transposition
+    tt_lru = options.transposition_policy == "lru"
+    # hash -> (occupancy, remaining counts, placement index bounds, pieces placed)
+    # (an OrderedDict, since evicting the oldest key of a plain dict slows
+    # down as deleted slots pile up at its front)
+    transpositions = OrderedDict()
+    zobrist = [0]
+    if tt_limit:
+        rng = random.Random(ZOBRIST_SEED)
+        cell_keys = [rng.getrandbits(64) for _ in range(width * height)]
+        # XORed in when a type's remaining count drops from n to n - 1
+        count_keys = {shape_id: [0] + [rng.getrandbits(64) for _ in range(left)]
+                      for shape_id, left in remaining.items()}
+        place_keys = {shape_id: [None] * len(masks)
+                      for shape_id, masks in shifted_masks.items()}
+    
+    def step_key(shape_id: int, i: int) -> int:
+        # Hash change for placing copy number remaining[shape_id] of the
+        # type at shifted_masks[shape_id][i]; placing it again undoes it
+        key = place_keys[shape_id][i]
+        if key is None:
+            key = 0
+            mask = shifted_masks[shape_id][i]
+            while mask:
+                low = mask & -mask
+                key ^= cell_keys[low.bit_length() - 1]
+                mask ^= low
+            place_keys[shape_id][i] = key
+        return key ^ count_keys[shape_id][remaining[shape_id]]
+    
+    def known_failure(bounds: Tuple[int, ...]) -> bool:
+        entry = transpositions.get(zobrist[0])
+        if (entry is not None and entry[0] == board[0]
+                and entry[1] == tuple(remaining.values())
+                and all(old <= new for old, new in zip(entry[2], bounds))):
+            monitor.tt_hits += 1
+            if tt_lru:
+                transpositions.move_to_end(zobrist[0])
+            return True
+        monitor.tt_misses += 1
+        return False
+    
+    def record_failure(bounds: Tuple[int, ...], placed: int):
+        key = zobrist[0]
+        transpositions[key] = (board[0], tuple(remaining.values()), bounds, placed)
+        if tt_lru:
+            transpositions.move_to_end(key)
+        if len(transpositions) > tt_limit:
+            if tt_lru:
+                transpositions.popitem(last=False)
+            else:
+                kept = sorted(transpositions.items(), key=lambda item: item[1][3])
+                transpositions.clear()
+                transpositions.update(kept[:tt_limit // 2])
+    
+    def capacity_left() -> bool:
+        # Per type, the cells its live placements reach bound how many
+        # copies still fit; cells no remaining type reaches stay empty
+        free = table.full & ~board[0]
+        reachable = 0
+        for shape_id, left in remaining.items():
+            if left:
+                cells = table.coverage(shape_id, free)
+                if cells.bit_count() < left * sizes[shape_id]:
+                    return False
+                reachable |= cells
+        return (free & ~reachable).bit_count() <= slack
+    
+    def dead_after(mask: int, dead: int) -> int:
+        # Dead cells once `mask` is placed: the old ones plus any in the
+        # components the placement just split off
+        min_size = min(sizes[sid] for sid, left in remaining.items() if left)
+        free = table.full & ~board[0]
+        return dead | dead_cells(table, free, table.grow(mask) & free, remaining,
+                                 min_size, fit_cache)
     
-    for region_idx, (width, height, counts) in enumerate(regions):
-        region_num = region_idx + 1
-        log(f"Region {region_num}/{total_regions}: {width}x{height} grid ({width * height} cells)")
+    def backtrack(shape_index: int, start: int, dead: int) -> bool:
+        if shape_index >= len(sequence):
+            return True
         
-        # Build list of shapes to place
-        shapes_to_place = []
-        shape_summary = []
-        for shape_id, quantity in enumerate(counts):
-            if quantity > 0:
-                shapes_to_place.extend([shape_id] * quantity)
-                shape_summary.append(f"{quantity}x shape{shape_id}")
+        shape_id = sequence[shape_index]
+        masks = shifted_masks[shape_id]
         
-        if shape_summary:
-            log(f"  Shapes needed: {', '.join(shape_summary)}")
-        else:
-            log(f"  Shapes needed: none")
+        # The next copy of the same shape must go after this one
+        same_next = (shape_index + 1 < len(sequence)
+                     and sequence[shape_index + 1] == shape_id)
+        end = len(masks)
+        if shape_index == 0 and first_limit is not None:
+            end = first_limit
+        
+        # Probe only above the last few pieces, where a hit saves more than
+        # the lookup costs; deeper down the hash is not needed or kept
+        probe = tt_limit and len(sequence) - shape_index >= TRANSPOSITION_MIN_LEFT
+        if probe and shape_index and known_failure((start,)):
+            return False
+        
+        for i in range(start, end):
+            mask = masks[i]
+            monitor.tick(shape_index)
+            
+            if not board[0] & mask:
+                if probe:
+                    key = step_key(shape_id, i)
+                    zobrist[0] ^= key
+                board[0] ^= mask
+                remaining[shape_id] -= 1
+                path.append((shape_id, mask))
+                monitor.nodes += 1
+                
+                child_dead = dead
+                if use_dead_space and shape_index + 1 < len(sequence):
+                    child_dead = dead_after(mask, dead)
+                
+                if (child_dead.bit_count() <= slack
+                        and (not use_forward_check or shape_index + 1 == len(sequence)
+                             or capacity_left())
+                        and backtrack(shape_index + 1, i + 1 if same_next else 0,
+                                      child_dead)):
+                    return True
+                
+                path.pop()
+                remaining[shape_id] += 1
+                board[0] ^= mask
+                if probe:
+                    zobrist[0] ^= key
         
-        log(f"  Total shapes to place: {len(shapes_to_place)}")
+        if probe and shape_index:
+            record_failure((start,), shape_index)
+        return False
+    
+    if options.ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering {options.ordering!r}, expected one of {ORDERINGS}")
+    mrv = options.ordering == "mrv"
+    type_order = None
+    if mrv:
+        # Placements blocked by how many occupied cells, and how many of
+        # each remaining type are not blocked at all
+        by_cell = [[index for index in indices if table.shape_of[index] in remaining]
+                   for indices in table.by_cell]
+        shape_of = table.shape_of
+        blocked = [0] * len(table.masks)
+        live = {shape_id: len(table.by_shape[shape_id]) for shape_id in remaining}
+        type_order = list(dict.fromkeys(sequence))
+        next_start = {shape_id: 0 for shape_id in remaining}
+    
+    def occupy(mask: int):
+        while mask:
+            low = mask & -mask
+            for index in by_cell[low.bit_length() - 1]:
+                if not blocked[index]:
+                    live[shape_of[index]] -= 1
+                blocked[index] += 1
+            mask ^= low
+    
+    def vacate(mask: int):
+        while mask:
+            low = mask & -mask
+            for index in by_cell[low.bit_length() - 1]:
+                blocked[index] -= 1
+                if not blocked[index]:
+                    live[shape_of[index]] += 1
+            mask ^= low
+    
+    def backtrack_mrv(placed: int, dead: int) -> bool:
+        if placed == len(sequence):
+            return True
         
-        # Calculate cells needed
-        total_cells_needed = sum(
-            len(list(all_orientations[sid])[0]) for sid in shapes_to_place
-        )
-        total_cells_available = width * height
-        fill_percentage = (total_cells_needed / total_cells_available * 100) if total_cells_available > 0 else 0
+        if placed == 0:
+            shape_id = sequence[0]
+        else:
+            # Fewest live placements first, ties in sequence order
+            shape_id = None
+            for sid in type_order:
+                left = remaining[sid]
+                if left:
+                    if live[sid] < left:
+                        return False
+                    if shape_id is None or live[sid] < live[shape_id]:
+                        shape_id = sid
         
-        log(f"  Cells needed: {total_cells_needed} / {total_cells_available} available ({fill_percentage:.1f}% fill)")
+        masks = shifted_masks[shape_id]
+        start = next_start[shape_id]
+        end = len(masks)
+        if placed == 0 and first_limit is not None:
+            end = first_limit
         
-        # Quick check
-        if total_cells_needed > total_cells_available:
-            log(f"  [X] IMPOSSIBLE - Not enough space!")
-            log()
-            continue
+        probe = tt_limit and len(sequence) - placed >= TRANSPOSITION_MIN_LEFT
+        if probe:
+            bounds = tuple(next_start.values())
+            if placed and known_failure(bounds):
+                return False
         
-        if not shapes_to_place:
-            log(f"  [OK] TRIVIAL - No shapes to place!")
-            solvable_count += 1
-            log()
-            continue
+        for i in range(start, end):
+            mask = masks[i]
+            monitor.tick(placed)
+            
+            if not board[0] & mask:
+                if probe:
+                    key = step_key(shape_id, i)
+                    zobrist[0] ^= key
+                board[0] ^= mask
+                remaining[shape_id] -= 1
+                path.append((shape_id, mask))
+                monitor.nodes += 1
+                occupy(mask)
+                next_start[shape_id] = i + 1
+                
+                child_dead = dead
+                if use_dead_space and placed + 1 < len(sequence):
+                    child_dead = dead_after(mask, dead)
+                
+                if (child_dead.bit_count() <= slack
+                        and (not use_forward_check or placed + 1 == len(sequence)
+                             or capacity_left())
+                        and backtrack_mrv(placed + 1, child_dead)):
+                    return True
+                
+                next_start[shape_id] = start
+                vacate(mask)
+                path.pop()
+                remaining[shape_id] += 1
+                board[0] ^= mask
+                if probe:
+                    zobrist[0] ^= key
         
-        # Sort shapes by size (largest first) for better pruning
-        shapes_to_place.sort(
-            key=lambda sid: -len(list(all_orientations[sid])[0])
-        )
+        if probe and placed:
+            record_failure(bounds, placed)
+        return False
+    
+    # Level of the piece on each occupied cell, and per remaining counts
+    # the learned (cells, lowest placement index) nogoods
+    owner = [0] * (width * height)
+    nogoods: Dict[Tuple[int, ...], list] = {}
+    
+    def culprits(cells: int) -> int:
+        # Levels of the pieces covering `cells`, as a bitmask of levels
+        levels = 0
+        while cells:
+            low = cells & -cells
+            levels |= 1 << owner[low.bit_length() - 1]
+            cells ^= low
+        return levels
+    
+    def backtrack_cbj(shape_index: int, start: int, dead: int) -> Optional[int]:
+        # Returns None once every piece is placed, else the conflict: the
+        # earlier levels the failure depends on, as a bitmask of levels
+        shape_id = sequence[shape_index]
+        masks = shifted_masks[shape_id]
         
-        log(f"  Solving (largest shapes first)...")
+        same_next = (shape_index + 1 < len(sequence)
+                     and sequence[shape_index + 1] == shape_id)
+        end = len(masks)
+        if shape_index == 0 and first_limit is not None:
+            end = first_limit
         
-        # Try to solve
-        if solve_region(width, height, shapes_to_place, all_orientations, region_num):
-            solvable_count += 1
-            log(f"  [OK] SUCCESS - All shapes fit!")
-        else:
-            log(f"  [X] FAILED - Cannot fit all shapes")
+        # Skipping the placements below `start` is down to the previous copy
+        bound = 1 << (shape_index - 1) if start else 0
+        below = (1 << shape_index) - 1
+        state = tuple(remaining.values())
+        for cells, least in nogoods.get(state, ()):
+            if least <= start and not cells & ~board[0]:
+                monitor.nogood_hits += 1
+                return culprits(cells) | (bound if least else 0)
         
-        log()
+        conflict = bound
+        for i in range(start, end):
+            mask = masks[i]
+            monitor.tick(shape_index)
+            
+            overlap = board[0] & mask
+            if overlap:
+                conflict |= 1 << owner[(overlap & -overlap).bit_length() - 1]
+                continue
+            
+            board[0] ^= mask
+            remaining[shape_id] -= 1
+            path.append((shape_id, mask))
+            monitor.nodes += 1
+            cells = mask
+            while cells:
+                low = cells & -cells
+                owner[low.bit_length() - 1] = shape_index
+                cells ^= low
+            
+            last = shape_index + 1 == len(sequence)
+            child_dead = dead
+            if use_dead_space and not last:
+                child_dead = dead_after(mask, dead)
+            
+            if last:
+                return None
+            if (child_dead.bit_count() > slack
+                    or (use_forward_check and not capacity_left())):
+                child = below | 1 << shape_index
+            else:
+                child = backtrack_cbj(shape_index + 1, i + 1 if same_next else 0, child_dead)
+                if child is None:
+                    return None
+            
+            path.pop()
+            remaining[shape_id] += 1
+            board[0] ^= mask
+            
+            if not child >> shape_index & 1:
+                # This piece played no part, so no other spot for it helps
+                monitor.backjumps += 1
+                return child
+            conflict |= child & below
+        
+        if shape_index and conflict != below:
+            cells = 0
+            levels = conflict
+            while levels:
+                low = levels & -levels
+                cells |= path[low.bit_length() - 1][1]
+                levels ^= low
+            learned = nogoods.setdefault(state, [])
+            learned.append((cells, start))
+            if len(learned) > NOGOOD_LIMIT:
+                learned.pop(0)
+        return conflict
     
-    # Final summary
-    log("=" * 60)
-    log("FINAL RESULTS")
-    log("=" * 60)
-    log(f"  Regions that CAN fit all shapes: {solvable_count} / {total_regions}")
-    log()
-    log("=" * 60)
-    log(f"ANSWER: {solvable_count}")
-    log("=" * 60)
-    log()
+    if options.backjump and (mrv or tt_limit):
+        raise ValueError("Backjumping only works with the static ordering and "
+                         "no transposition table")
     
-    return solvable_count
+    def restart(shuffler: random.Random):
+        # Reorder, and clear what the aborted run left on the board
+        nonlocal type_order, place_keys
+        arrange(shuffler)
+        board[0] = 0
+        path.clear()
+        remaining.update(counts)
+        zobrist[0] = 0
+        # A failure with every placement index bound at 0 holds in any
+        # order; the others only held for the order just dropped
+        for key, entry in list(transpositions.items()):
+            if any(entry[2]):
+                del transpositions[key]
+        if tt_limit:
+            place_keys = {shape_id: [None] * len(masks)
+                          for shape_id, masks in shifted_masks.items()}
+        if mrv:
+            type_order = list(dict.fromkeys(sequence))
+            next_start.update(dict.fromkeys(next_start, 0))
+            blocked[:] = [0] * len(blocked)
+            live.update({shape_id: len(table.by_shape[shape_id]) for shape_id in live})
+        # Placement index bounds mean nothing in the new order
+        for state, learned in list(nogoods.items()):
+            learned[:] = [(cells, 0) for cells, least in learned if not least]
+            if not learned:
+                del nogoods[state]
+    
+    def search(dead: int) -> bool:
+        if options.backjump:
+            return backtrack_cbj(0, 0, dead) is None
+        return backtrack_mrv(0, dead) if mrv else backtrack(0, 0, dead)
+    
+    if slack < 0:
+        return None
+    if not sequence:
+        return path
+    dead = 0
+    if use_dead_space:
+        dead = dead_after(table.full, 0)
+    if dead.bit_count() > slack:
+        return None
+    if not options.restarts:
+        return path if search(dead) else None
+    
+    shuffler = random.Random(options.seed)
+    node_limit = monitor.node_limit
+    run = 1
+    while True:
+        monitor.node_limit = min(node_limit, monitor.attempts + RESTART_UNIT * luby(run))
+        try:
+            return path if search(dead) else None
+        except SearchBudgetExceeded:
+            if monitor.attempts > node_limit or monitor.attempts <= monitor.node_limit:
+                raise
+        finally:
+            monitor.node_limit = node_limit
+        monitor.restarts += 1
+        run += 1
+        restart(shuffler)
 
 
-def main():
+def solve_region_dlx(width: int, height: int, shapes_to_place: List[int],
+                     all_orientations: Orientations, table: PlacementTable,
+                     monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
     """
-    Main entry point for command-line usage.
+    Exact cover with Knuth's Dancing Links (Algorithm X).
+
+    Each shape type is a primary column that must be covered exactly as
+    many times as there are copies of it; each grid cell is a secondary
+    column, so it may be covered at most once or left empty. Rows are the
+    placements in the table. The column with the fewest remaining options
+    is branched on first. Copies of one type are taken in column order:
+    once a row has been tried it is removed for the rest of the level, so
+    the search never revisits a permutation of identical pieces. With
+    `options.symmetry`, the first shape's rows are ordered by
+    symmetry_order and its first copy is limited to the orbit
+    representatives.
     """
-    # Read input
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        log(f"Reading input from: {input_file}")
-        with open(input_file, 'r') as f:
-            text = f.read()
-    else:
-        log("Reading input from stdin...")
-        text = sys.stdin.read()
+    need_by_shape: Dict[int, int] = {}
+    for shape_id in shapes_to_place:
+        need_by_shape[shape_id] = need_by_shape.get(shape_id, 0) + 1
+    shape_ids = sorted(need_by_shape)
+    num_primary = len(shape_ids)
+    num_columns = num_primary + width * height
     
-    result = solve(text)
+    # Node arrays: headers come first (0 is the root), row nodes follow
+    root = num_columns
+    L = list(range(num_columns + 1))
+    R = list(range(num_columns + 1))
+    U = list(range(num_columns + 1))
+    D = list(range(num_columns + 1))
+    C = list(range(num_columns + 1))
+    length = [0] * (num_columns + 1)
+    need = [need_by_shape[sid] for sid in shape_ids] + [0] * (width * height)
+    total_need = list(need)
     
-    # Also print just the number for easy parsing
-    print(result)
+    # Only primary columns are linked into the root list
+    order = [root] + list(range(num_primary))
+    for i, col in enumerate(order):
+        R[col] = order[(i + 1) % len(order)]
+        L[col] = order[i - 1]
+    
+    def append_node(col: int) -> int:
+        node = len(C)
+        C.append(col)
+        U.append(U[col])
+        D.append(col)
+        D[U[col]] = node
+        U[col] = node
+        length[col] += 1
+        return node
+    
+    # Type-column nodes of rows the first copy of the restricted shape
+    # may not use, and the placement behind each row
+    restricted_col = -1
+    non_representative = set()
+    row_placement = {}
+    
+    for column, shape_id in enumerate(shape_ids):
+        rows = table.by_shape[shape_id]
+        num_reps = len(rows)
+        if options.symmetry and shape_id == shapes_to_place[0]:
+            rows, num_reps = table.symmetry_order(shape_id)
+            restricted_col = column
+        for row_num, index in enumerate(rows):
+            mask = table.masks[index]
+            nodes = [append_node(column)]
+            row_placement[nodes[0]] = (shape_id, mask)
+            if row_num >= num_reps:
+                non_representative.add(nodes[0])
+            while mask:
+                low = mask & -mask
+                nodes.append(append_node(num_primary + low.bit_length() - 1))
+                mask ^= low
+            L.extend([0] * len(nodes))
+            R.extend([0] * len(nodes))
+            for i, node in enumerate(nodes):
+                R[node] = nodes[(i + 1) % len(nodes)]
+                L[node] = nodes[i - 1]
+    
+    def cover(col: int):
+        if col < num_primary:
+            L[R[col]] = L[col]
+            R[L[col]] = R[col]
+        i = D[col]
+        while i != col:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                length[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+    
+    def uncover(col: int):
+        i = U[col]
+        while i != col:
+            j = L[i]
+            while j != i:
+                length[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        if col < num_primary:
+            L[R[col]] = col
+            R[L[col]] = col
+    
+    def hide_row(node: int):
+        # Remove the whole row (including `node`) from its columns
+        j = node
+        while True:
+            U[D[j]] = U[j]
+            D[U[j]] = D[j]
+            length[C[j]] -= 1
+            j = R[j]
+            if j == node:
+                break
+    
+    def unhide_row(node: int):
+        j = L[node]
+        while True:
+            length[C[j]] += 1
+            U[D[j]] = j
+            D[U[j]] = j
+            if j == node:
+                break
+            j = L[j]
+    
+    path = []
+    
+    def search(depth: int) -> bool:
+        if R[root] == root:
+            return True
+        
+        # Minimum remaining values: fewest rows per copy still needed
+        best = -1
+        best_slack = None
+        col = R[root]
+        while col != root:
+            slack = length[col] - need[col]
+            if slack < 0:
+                return False
+            if best_slack is None or slack < best_slack:
+                best, best_slack = col, slack
+            col = R[col]
+        
+        col = best
+        restricted = col == restricted_col and need[col] == total_need[col]
+        if need[col] == 1:
+            # Last copy: the column is finished by whichever row is chosen
+            cover(col)
+            r = D[col]
+            while r != col:
+                if restricted and r in non_representative:
+                    break
+                monitor.tick(depth)
+                j = R[r]
+                while j != r:
+                    cover(C[j])
+                    j = R[j]
+                
+                path.append(row_placement[r])
+                monitor.nodes += 1
+                if search(depth + 1):
+                    return True
+                path.pop()
+                
+                j = L[r]
+                while j != r:
+                    uncover(C[j])
+                    j = L[j]
+                r = D[r]
+            uncover(col)
+            return False
+        
+        # More copies remain: take rows in column order and drop each one
+        # once tried, so later copies only ever use rows further down
+        tried = []
+        found = False
+        while D[col] != col:
+            r = D[col]
+            if restricted and r in non_representative:
+                break
+            monitor.tick(depth)
+            hide_row(r)
+            tried.append(r)
+            need[col] -= 1
+            j = R[r]
+            while j != r:
+                cover(C[j])
+                j = R[j]
+            
+            path.append(row_placement[r])
+            monitor.nodes += 1
+            found = search(depth + 1)
+            if not found:
+                path.pop()
+            
+            j = L[r]
+            while j != r:
+                uncover(C[j])
+                j = L[j]
+            need[col] += 1
+            if found:
+                break
+        
+        for r in reversed(tried):
+            unhide_row(r)
+        return found
+    
+    return path if search(0) else None
 
 
-if __name__ == "__main__":
-    # Automatically use day_twelve_test_input.txt
-    input_file = "day_twelve_input.txt"
-    log(f"Reading input from: {input_file}")
-    with open(input_file, 'r') as f:
-        text = f.read()
-    result = solve(text)
-    print(result)
+def solve_region_cell(width: int, height: int, shapes_to_place: List[int],
+                      all_orientations: Orientations, table: PlacementTable,
+                      monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Branch on the top-left-most undecided cell instead of on a piece.
 
+    The cell is either covered by a placement anchored there (every cell
+    before it is already decided, so no other placement can reach it) or
+    left empty. Leaving cells empty is limited by the slack budget,
+    width * height minus the cells the shapes need; once it is spent every
+    remaining cell must be covered, which prunes whole subtrees on tightly
+    filled regions. Copies never need ordering here since two copies can
+    never share an anchor. Board symmetry is not used.
+    
+    With `options.dead_space`, every decision re-examines the undecided
+    components next to it; cells that can never be covered will have to be
+    left empty, so once they outnumber the remaining slack the branch is
+    cut. It is off by default here: the cursor never leaves holes behind
+    it, so the pruning rarely pays for the flood fills.
+    """
+    sequence = group_copies(shapes_to_place)
+    shape_ids = list(dict.fromkeys(sequence))
+    remaining = {shape_id: sequence.count(shape_id) for shape_id in shape_ids}
+    rank = {shape_id: i for i, shape_id in enumerate(shape_ids)}
+    total = len(sequence)
+    
+    # Candidate placements per anchor cell, largest-first shape order
+    candidates = [
+        sorted(((table.shape_of[i], table.masks[i]) for i in cell_indices
+                if table.shape_of[i] in remaining),
+               key=lambda item: rank[item[0]])
+        for cell_indices in table.anchored
+    ]
+    
+    full = table.full
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in shape_ids}
+    slack = width * height - sum(sizes[sid] for sid in sequence)
+    fit_cache = {}
+    
+    def dead_after(decided: int, mask: int, dead: int) -> int:
+        # Dead undecided cells once `mask` is decided: the old ones that are
+        # still undecided plus any in the components next to `mask`
+        free = full & ~decided
+        if not options.dead_space or not free:
+            return dead & free
+        min_size = min(sizes[sid] for sid, left in remaining.items() if left)
+        return (dead & free) | dead_cells(table, free, table.grow(mask) & free,
+                                          remaining, min_size, fit_cache)
+    
+    path = []
+    
+    def search(decided: int, slack: int, placed: int, dead: int) -> bool:
+        # Leaving the cell empty is the last option, so it loops instead of
+        # recursing; only placements add stack depth
+        while placed < total:
+            if dead.bit_count() > slack:
+                return False
+            
+            free = full & ~decided
+            cell = (free & -free).bit_length() - 1
+            
+            for shape_id, mask in candidates[cell]:
+                if remaining[shape_id] and not decided & mask:
+                    monitor.tick(placed)
+                    remaining[shape_id] -= 1
+                    path.append((shape_id, mask))
+                    monitor.nodes += 1
+                    found = (placed + 1 == total
+                             or search(decided | mask, slack, placed + 1,
+                                       dead_after(decided | mask, mask, dead)))
+                    remaining[shape_id] += 1
+                    if found:
+                        return True
+                    path.pop()
+            
+            if slack == 0:
+                return False
+            monitor.tick(placed)
+            decided |= 1 << cell
+            slack -= 1
+            dead = dead_after(decided, 1 << cell, dead)
+        
+        return True
+    
+    if slack < 0:
+        return None
+    return path if search(0, slack, 0, dead_after(0, full, 0)) else None
+
+
+# Failed states the frontier engine remembers per region before evicting
+# the least recently used
+FRONTIER_TABLE_LIMIT = 500_000
+
+
+def solve_region_frontier(width: int, height: int, shapes_to_place: List[int],
+                          all_orientations: Orientations, table: PlacementTable,
+                          monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Broken-profile dynamic programming for narrow regions.
+
+    The region is turned so rows run along its short side and cells are
+    decided in row-major order, as in the cell engine. What is left to do
+    at the cursor depends only on the cursor, the occupancy of the cells
+    after it (the frontier, which placements anchored at or before the
+    cursor can only reach a few rows into) and the remaining counts, so
+    states that failed once are remembered under one int key and never
+    expanded again. The number of states grows with 2 ** (frontier size),
+    which is small when the short side is. The table holds up to
+    FRONTIER_TABLE_LIMIT states, evicting the least recently used.
+    Options are ignored.
+    """
+    transposed = width > height
+    if transposed:
+        width, height = height, width
+        table = PlacementTable(width, height, all_orientations)
+    
+    sequence = group_copies(shapes_to_place)
+    shape_ids = list(dict.fromkeys(sequence))
+    remaining = {shape_id: sequence.count(shape_id) for shape_id in shape_ids}
+    rank = {shape_id: i for i, shape_id in enumerate(shape_ids)}
+    total = len(sequence)
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in shape_ids}
+    slack = width * height - sum(sizes[sid] for sid in sequence)
+    if slack < 0:
+        return None
+    
+    candidates = [
+        sorted(((table.shape_of[i], table.masks[i]) for i in cell_indices
+                if table.shape_of[i] in remaining),
+               key=lambda item: rank[item[0]])
+        for cell_indices in table.anchored
+    ]
+    
+    # State key: remaining counts, then frontier bits, then the cursor
+    cell_bits = (width * height).bit_length()
+    frontier_bits = max((mask.bit_length() - (mask & -mask).bit_length() + 1
+                         for mask in table.masks), default=1)
+    count_bits = max(remaining.values()).bit_length()
+    unit = {shape_id: 1 << (cell_bits + frontier_bits + count_bits * rank[shape_id])
+            for shape_id in shape_ids}
+    counts_key = sum(unit[sid] * quantity for sid, quantity in remaining.items())
+    
+    full = table.full
+    failed: OrderedDict = OrderedDict()
+    path = []
+    
+    def search(decided: int, slack: int, placed: int, counts_key: int) -> bool:
+        visited = []
+        while placed < total:
+            free = full & ~decided
+            cell = (free & -free).bit_length() - 1
+            key = counts_key | ((decided >> cell) << cell_bits) | cell
+            if key in failed:
+                # Refresh its place in the eviction order
+                failed.move_to_end(key)
+                break
+            visited.append(key)
+            
+            for shape_id, mask in candidates[cell]:
+                if remaining[shape_id] and not decided & mask:
+                    monitor.tick(placed)
+                    remaining[shape_id] -= 1
+                    path.append((shape_id, mask))
+                    monitor.nodes += 1
+                    found = (placed + 1 == total
+                             or search(decided | mask, slack, placed + 1,
+                                       counts_key - unit[shape_id]))
+                    remaining[shape_id] += 1
+                    if found:
+                        return True
+                    path.pop()
+            
+            if slack == 0:
+                break
+            monitor.tick(placed)
+            decided |= 1 << cell
+            slack -= 1
+        else:
+            return True
+        
+        for key in visited:
+            if len(failed) >= FRONTIER_TABLE_LIMIT:
+                failed.popitem(last=False)
+            failed[key] = True
+        return False
+    
+    if not search(0, slack, 0, counts_key):
+        return None
+    if not transposed:
+        return path
+    
+    # Back to the region's own orientation
+    solution = []
+    for shape_id, mask in path:
+        original = 0
+        while mask:
+            bit = mask & -mask
+            r, c = divmod(bit.bit_length() - 1, width)
+            original |= 1 << (c * height + r)
+            mask ^= bit
+        solution.append((shape_id, original))
+    return solution
+
+
+class CountVectors:
+    """
+    Count vectors packed into one int, `bits` per shape, for the strip
+    engine's inner loops. Fields are sized so that any two vectors bounded
+    by the largest cap can be added without a carry reaching the top bit of
+    a field, which is kept clear as a guard: componentwise comparison and
+    capping then take a few integer operations.
+    """
+
+    def __init__(self, num_shapes: int, largest: int):
+        self.num_shapes = num_shapes
+        self.bits = max(largest, 1).bit_length() + 2
+        self.guards = sum(1 << (self.bits * i + self.bits - 1) for i in range(num_shapes))
+    
+    def pack(self, counts: List[int]) -> int:
+        return sum(quantity << (self.bits * i) for i, quantity in enumerate(counts))
+    
+    def unpack(self, packed: int) -> List[int]:
+        field = (1 << self.bits) - 1
+        return [(packed >> (self.bits * i)) & field for i in range(self.num_shapes)]
+    
+    def capped_sum(self, a: int, b: int, cap: int) -> int:
+        """
+        a + b with every field limited to the one in `cap`.
+        """
+        total = a + b
+        over = ((cap | self.guards) - total) & self.guards ^ self.guards
+        if over:
+            fields = over - (over >> (self.bits - 1))
+            total = (total & ~fields) | (cap & fields)
+        return total
+    
+    def dominates(self, a: int, b: int) -> bool:
+        return ((a | self.guards) - b) & self.guards == self.guards
+
+
+class ParetoFront:
+    """
+    Antichain of maximal packed count vectors, each with a witness, capped
+    at `limit` entries. Past the limit trim() drops the vectors furthest
+    from a target mix, which only loses answers, never makes a wrong one.
+    """
+
+    def __init__(self, vectors: CountVectors, limit: int):
+        self.vectors = vectors
+        self.limit = limit
+        self.entries: Dict[int, object] = {}
+    
+    def add(self, vector: int, witness) -> bool:
+        # CountVectors.dominates, inlined
+        guards = self.vectors.guards
+        entries = self.entries
+        if vector in entries:
+            return False
+        for known in entries:
+            if ((known | guards) - vector) & guards == guards:
+                return False
+        raised = vector | guards
+        beaten = [known for known in entries if (raised - known) & guards == guards]
+        for known in beaten:
+            del entries[known]
+        entries[vector] = witness
+        return True
+    
+    def trim(self, target: List[float]):
+        """
+        Keep the `limit` vectors that get furthest towards `target`,
+        counting each shape only up to its target, then those with the
+        most pieces. Ranking by pieces alone fills up with the shapes that
+        pack most easily and loses the mixes a demand needs.
+        """
+        if len(self.entries) > self.limit:
+            unpack = self.vectors.unpack
+            
+            def rank(vector: int) -> Tuple[float, int]:
+                counts = unpack(vector)
+                return (-sum(min(quantity, goal) for quantity, goal in zip(counts, target)),
+                        -sum(counts))
+            
+            kept = sorted(self.entries, key=rank)[:self.limit]
+            self.entries = {vector: self.entries[vector] for vector in kept}
+
+
+# Entries kept per Pareto front in the strip engine
+STRIP_FRONT_LIMIT = 16
+
+
+def strip_moves(k: int, all_orientations: Orientations) -> List[Tuple[int, int, int, List]]:
+    """
+    Every set of non-overlapping placements anchored in the first column of
+    a k-row window, as (mask, count vector, width, pieces). Window bits are
+    column-major (bit col * k + row), so dropping a column is a shift by k.
+    Pieces are (shape_id, cells) with cells relative to the window.
+    """
+    anchored = []
+    for shape_id, orientations in all_orientations.items():
+        for orientation in orientations:
+            rows = max(r for r, c in orientation) + 1
+            cols = max(c for r, c in orientation) + 1
+            for dr in range(k - rows + 1):
+                cells = [(r + dr, c) for r, c in orientation]
+                mask = 0
+                for r, c in cells:
+                    mask |= 1 << (c * k + r)
+                anchored.append((shape_id, mask, cols, cells))
+    
+    moves = []
+    counts = [0] * len(all_orientations)
+    
+    def extend(start: int, mask: int, width: int, pieces: List):
+        moves.append((mask, list(counts), width, list(pieces)))
+        for i in range(start, len(anchored)):
+            shape_id, piece_mask, cols, cells = anchored[i]
+            if piece_mask & mask == 0:
+                counts[shape_id] += 1
+                pieces.append((shape_id, cells))
+                extend(i + 1, mask | piece_mask, max(width, cols), pieces)
+                pieces.pop()
+                counts[shape_id] -= 1
+    
+    extend(0, 0, 0, [])
+    return moves
+
+
+def strip_front(k: int, length: int, cap: List[int], share: List[float],
+                all_orientations: Orientations, vectors: CountVectors,
+                monitor: SearchMonitor) -> ParetoFront:
+    """
+    Maximal count vectors (capped at `cap`) of packings inside a k x length
+    strip, by column-profile dynamic programming.
+
+    Columns are filled left to right. The state is the occupancy of the
+    current column and the ones pieces placed before it reach into, and
+    each state keeps a Pareto front of the count vectors reaching it,
+    trimmed towards the strip's `share` of the demand prorated to the
+    columns filled so far. Witnesses are linked lists (column, move index,
+    previous witness) into strip_moves.
+    """
+    moves = [(mask, vectors.pack(counts), width)
+             for mask, counts, width, pieces in strip_moves(k, all_orientations)]
+    packed_cap = vectors.pack(cap)
+    capped_sum = vectors.capped_sum
+    
+    states = {0: ParetoFront(vectors, STRIP_FRONT_LIMIT)}
+    states[0].add(0, None)
+    for col in range(length):
+        next_states: Dict[int, ParetoFront] = {}
+        for profile, front in states.items():
+            for index, (mask, counts, width) in enumerate(moves):
+                if mask & profile or col + width > length:
+                    continue
+                monitor.tick(0)
+                next_profile = (profile | mask) >> k
+                next_front = next_states.get(next_profile)
+                if next_front is None:
+                    next_front = next_states[next_profile] = ParetoFront(vectors, STRIP_FRONT_LIMIT)
+                for vector, witness in front.entries.items():
+                    next_front.add(capped_sum(vector, counts, packed_cap),
+                                   (col, index, witness))
+        target = [quantity * (col + 1) / length for quantity in share]
+        for front in next_states.values():
+            front.trim(target)
+        states = next_states
+    
+    # Nothing reaches past the last column, so only the empty profile is left
+    return states[0]
+
+
+def solve_region_strips(width: int, height: int, shapes_to_place: List[int],
+                        all_orientations: Orientations, table: PlacementTable,
+                        monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Cut the region into k-row strips and pack each strip on its own.
+
+    k is the smallest height every needed shape can be turned to (3 for a
+    catalog of 3x3 shapes), and the last strips take a leftover row each. Each
+    strip's achievable count vectors come from strip_front, and a multiset
+    knapsack over the strips looks for one vector per strip adding up to
+    the demand. Strips along both axes are tried. Pieces never cross a
+    strip boundary and the fronts are truncated.
+    """
+    num_shapes = len(all_orientations)
+    demand = [0] * num_shapes
+    for shape_id in shapes_to_place:
+        demand[shape_id] += 1
+    k = max(min(max(r for r, c in o) + 1 for o in all_orientations[shape_id])
+            for shape_id in set(shapes_to_place))
+    # A move anchors at most one piece per row of a strip under 2k rows
+    vectors = CountVectors(num_shapes, max(max(demand), 2 * k - 1))
+    packed_demand = vectors.pack(demand)
+    moves = strip_moves(k, all_orientations)
+    
+    for length, depth, transposed in ((width, height, False), (height, width, True)):
+        if depth < k:
+            continue
+        # The leftover rows go one each to the last strips: a (k + 1)-row
+        # front costs a few times a k-row one, a (k + 2)-row one ten times
+        strips, extra = divmod(depth, k)
+        if strips >= extra:
+            heights = [k] * (strips - extra) + [k + 1] * extra
+        else:
+            heights = [k] * (strips - 1) + [k + extra]
+        
+        # Each strip can be asked for a little more than its even share
+        cap = [min(quantity, -(-quantity // len(heights)) + 1) for quantity in demand]
+        share = [quantity / len(heights) for quantity in demand]
+        # The fronts are trimmed towards this region's demand, so strips of
+        # the same height share one but other regions cannot reuse it
+        by_height = {strip_height: strip_front(strip_height, length, cap, share,
+                                               all_orientations, vectors, monitor)
+                     for strip_height in set(heights)}
+        fronts = [by_height[strip_height] for strip_height in heights]
+        
+        # Knapsack: sums of one vector per strip so far, with back pointers,
+        # trimmed towards the demand prorated to the rows covered so far
+        combined = ParetoFront(vectors, STRIP_FRONT_LIMIT)
+        combined.add(0, None)
+        rows = 0
+        for strip_height, front in zip(heights, fronts):
+            next_combined = ParetoFront(vectors, STRIP_FRONT_LIMIT)
+            for total, chain in combined.entries.items():
+                for vector in front.entries:
+                    monitor.tick(0)
+                    next_combined.add(vectors.capped_sum(total, vector, packed_demand),
+                                      (vector, chain))
+            rows += strip_height
+            next_combined.trim([quantity * rows / depth for quantity in demand])
+            combined = next_combined
+        if packed_demand not in combined.entries:
+            continue
+        
+        # Walk the back pointers and witnesses to lay out the pieces
+        chosen = []
+        chain = combined.entries[packed_demand]
+        while chain is not None:
+            vector, chain = chain
+            chosen.append(vector)
+        chosen.reverse()
+        
+        path = []
+        remaining = list(demand)
+        offset = 0
+        for strip_height, front, vector in zip(heights, fronts, chosen):
+            strip_moves_k = moves if strip_height == k else strip_moves(strip_height, all_orientations)
+            witness = front.entries[vector]
+            while witness is not None:
+                col, index, witness = witness
+                for shape_id, cells in strip_moves_k[index][3]:
+                    if not remaining[shape_id]:
+                        continue
+                    remaining[shape_id] -= 1
+                    mask = 0
+                    for r, c in cells:
+                        row, column = offset + r, col + c
+                        if transposed:
+                            row, column = column, row
+                        mask |= 1 << (row * width + column)
+                    path.append((shape_id, mask))
+            offset += strip_height
+        return path
+    
+    return None
+
+
+# Subrectangles of at most this many cells are searched directly by the
+# guillotine engine, with at most this many placement attempts each
+GUILLOTINE_LEAF_AREA = 100
+GUILLOTINE_LEAF_NODES = 20_000
+
+# Cut positions tried per side, as offsets from the proportional cut
+GUILLOTINE_CUT_OFFSETS = (0, 1, -1, 2, -2)
+
+# Guillotine subproblems by (catalog, w, h, counts), holding a packing or
+# None; the least recently used go first once the table is full. Failures
+# that only ran out of budget are not stored.
+GUILLOTINE_MEMO: OrderedDict = OrderedDict()
+GUILLOTINE_MEMO_LIMIT = 200_000
+
+
+def split_counts(counts: Tuple[int, ...], sizes: List[int],
+                 first_area: int, second_area: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Share the pieces between the two sides of a cut in proportion to their
+    areas. Each shape's odd piece out, largest shapes first, goes to
+    whichever side has more cells to spare at that point.
+    """
+    share = first_area / (first_area + second_area)
+    first = [int(quantity * share) for quantity in counts]
+    second = [int(quantity * (1 - share)) for quantity in counts]
+    first_spare = first_area - sum(q * size for q, size in zip(first, sizes))
+    second_spare = second_area - sum(q * size for q, size in zip(second, sizes))
+    for shape_id in sorted(range(len(counts)), key=lambda sid: -sizes[sid]):
+        for _ in range(counts[shape_id] - first[shape_id] - second[shape_id]):
+            if first_spare >= second_spare:
+                first[shape_id] += 1
+                first_spare -= sizes[shape_id]
+            else:
+                second[shape_id] += 1
+                second_spare -= sizes[shape_id]
+    return tuple(first), tuple(second)
+
+
+def solve_region_guillotine(width: int, height: int, shapes_to_place: List[int],
+                            all_orientations: Orientations, table: PlacementTable,
+                            monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Split the region by straight cuts and pack the two sides on their own.
+
+    A rectangle is cut across its longer side near the point that shares
+    its pieces out evenly (split_counts), and both sides are packed
+    recursively; a few cut positions along each axis are tried. Small
+    rectangles, at most GUILLOTINE_LEAF_AREA cells, are handed to
+    solve_region under a node budget of GUILLOTINE_LEAF_NODES, within
+    what is left of the region's budgets and charged to them; the
+    budgets are also checked before each subproblem. Subproblems are
+    memoized in GUILLOTINE_MEMO across regions. Only packings that
+    guillotine cuts can separate are found.
+    """
+    num_shapes = len(all_orientations)
+    sizes = [len(all_orientations[shape_id][0]) for shape_id in range(num_shapes)]
+    demand = [0] * num_shapes
+    for shape_id in shapes_to_place:
+        demand[shape_id] += 1
+    catalog = catalog_key(all_orientations)
+    min_side = max(min(min(max(r for r, c in o), max(c for r, c in o)) + 1
+                       for o in all_orientations[shape_id])
+                   for shape_id in set(shapes_to_place))
+    tables = OrderedDict()
+    # Leaves cut short by the region's budget so far; failures above one
+    # are not stored
+    cut_short = 0
+    
+    def leaf(w: int, h: int, counts: Tuple[int, ...]) -> Optional[list]:
+        nonlocal cut_short
+        shapes = [shape_id for shape_id, quantity in enumerate(counts) for _ in range(quantity)]
+        shapes.sort(key=lambda sid: -sizes[sid])
+        certificate = []
+        verdict = solve_region(w, h, shapes, all_orientations, 0, verbose=False,
+                               engine="auto",
+                               table=get_placement_table(w, h, all_orientations, tables),
+                               node_limit=GUILLOTINE_LEAF_NODES, certificate=certificate,
+                               parent=monitor)
+        if verdict is Verdict.UNKNOWN and monitor.exhausted():
+            cut_short += 1
+        return certificate if verdict is Verdict.YES else None
+    
+    def pack(w: int, h: int, counts: Tuple[int, ...]) -> Optional[list]:
+        if not any(counts):
+            return []
+        if sum(q * size for q, size in zip(counts, sizes)) > w * h:
+            return None
+        key = (catalog, w, h, counts)
+        if key in GUILLOTINE_MEMO:
+            GUILLOTINE_MEMO.move_to_end(key)
+            return GUILLOTINE_MEMO[key]
+        monitor.tick(0)
+        monitor.time_left()
+        cut_short_before = cut_short
+        
+        result = None
+        if w * h <= GUILLOTINE_LEAF_AREA:
+            result = leaf(w, h, counts)
+        else:
+            # (vertical cut?, side being cut), across the longer side first
+            axes = [(True, w), (False, h)]
+            if h > w:
+                axes.reverse()
+            for vertical, length in axes:
+                if result is not None:
+                    break
+                middle = length // 2
+                for offset in GUILLOTINE_CUT_OFFSETS:
+                    cut = middle + offset
+                    if cut < min_side or length - cut < min_side:
+                        continue
+                    if vertical:
+                        first_dims, second_dims = (cut, h), (w - cut, h)
+                    else:
+                        first_dims, second_dims = (w, cut), (w, h - cut)
+                    first_counts, second_counts = split_counts(
+                        counts, sizes, first_dims[0] * first_dims[1],
+                        second_dims[0] * second_dims[1])
+                    first = pack(*first_dims, first_counts)
+                    if first is None:
+                        continue
+                    second = pack(*second_dims, second_counts)
+                    if second is None:
+                        continue
+                    dr, dc = (0, cut) if vertical else (cut, 0)
+                    result = first + [(shape_id, [(r + dr, c + dc) for r, c in cells])
+                                      for shape_id, cells in second]
+                    break
+            # Rectangles just over the leaf size no cut works for are still
+            # cheap enough to search directly
+            if result is None and w * h <= 2 * GUILLOTINE_LEAF_AREA:
+                result = leaf(w, h, counts)
+        
+        if result is None and cut_short > cut_short_before:
+            return None
+        if len(GUILLOTINE_MEMO) >= GUILLOTINE_MEMO_LIMIT:
+            GUILLOTINE_MEMO.popitem(last=False)
+        GUILLOTINE_MEMO[key] = result
+        return result
+    
+    packing = pack(width, height, tuple(demand))
+    if packing is None:
+        return None
+    path = []
+    for shape_id, cells in packing:
+        mask = 0
+        for r, c in cells:
+            mask |= 1 << (r * width + c)
+        path.append((shape_id, mask))
+    return path
+
+
+# Macro tiles: rectangles up to this side, made of this many pieces, that
+# the pieces fill to at least this fraction
+MACRO_MAX_SIDE = 6
+MACRO_MAX_PIECES = 3
+MACRO_MIN_FILL = 0.85
+
+
+class MacroTile(NamedTuple):
+    """
+    A small rectangle densely packed with a few catalog pieces, used as a
+    single super-piece. `pieces` are (shape_id, cells) within the tile.
+    """
+    width: int
+    height: int
+    counts: Tuple[int, ...]
+    pieces: List[Tuple[int, List[Tuple[int, int]]]]
+
+
+# Macro tile libraries by catalog, built on first use
+MACRO_LIBRARIES: Dict[Tuple, List[MacroTile]] = {}
+
+
+def macro_library(all_orientations: Orientations) -> List[MacroTile]:
+    """
+    Every rectangle up to MACRO_MAX_SIDE on a side that some multiset of
+    2 to MACRO_MAX_PIECES pieces packs to at least MACRO_MIN_FILL, one
+    packing per (rectangle, multiset), found with the frontier engine.
+    Both orientations of each rectangle are listed, densest tiles first.
+    """
+    catalog = catalog_key(all_orientations)
+    if catalog in MACRO_LIBRARIES:
+        return MACRO_LIBRARIES[catalog]
+    
+    shape_ids = sorted(all_orientations)
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in shape_ids}
+    multisets = [combo for pieces in range(2, MACRO_MAX_PIECES + 1)
+                 for combo in itertools.combinations_with_replacement(shape_ids, pieces)]
+    
+    tiles = []
+    for w in range(2, MACRO_MAX_SIDE + 1):
+        for h in range(w, MACRO_MAX_SIDE + 1):
+            table = None
+            for combo in multisets:
+                cells = sum(sizes[shape_id] for shape_id in combo)
+                if cells > w * h or cells < MACRO_MIN_FILL * w * h:
+                    continue
+                if table is None:
+                    table = PlacementTable(w, h, all_orientations)
+                shapes = sorted(combo, key=lambda sid: -sizes[sid])
+                pieces = []
+                verdict = solve_region(w, h, shapes, all_orientations, 0, verbose=False,
+                                       engine="frontier", table=table, certificate=pieces)
+                if verdict is not Verdict.YES:
+                    continue
+                counts = tuple(combo.count(shape_id) for shape_id in range(len(shape_ids)))
+                tiles.append(MacroTile(w, h, counts, pieces))
+                if w != h:
+                    tiles.append(MacroTile(h, w, counts, transpose_cells(pieces)))
+    
+    tiles.sort(key=lambda tile: -sum(q * sizes[sid] for sid, q in enumerate(tile.counts))
+               / (tile.width * tile.height))
+    MACRO_LIBRARIES[catalog] = tiles
+    return tiles
+
+
+# Placement attempts allowed to the fine search of the leftover band, and
+# how many shelves of macro tiles it may take back
+MACRO_FINE_NODES = 50_000
+MACRO_BACKOFF_SHELVES = 4
+
+
+def macro_pack(width: int, height: int, demand: List[int], all_orientations: Orientations,
+               monitor: SearchMonitor) -> Optional[list]:
+    """
+    Coarse pass with macro tiles, then a fine search for the rest.
+
+    Tiles are taken densest first while the demand allows and laid flat
+    on shelves from the top, next-fit by decreasing height. The pieces
+    that did not make it into a tile go to solve_region in the band below
+    the shelves, under MACRO_FINE_NODES within what is left of the
+    region's budgets, which are charged for it. If that fails, the lowest
+    shelf is given back to the band and the search rerun, up to
+    MACRO_BACKOFF_SHELVES times. Returns the pieces as (shape_id, cells)
+    or None.
+    """
+    remaining = list(demand)
+    chosen = []
+    for tile in macro_library(all_orientations):
+        if tile.width < tile.height:
+            continue
+        while all(q <= left for q, left in zip(tile.counts, remaining)):
+            chosen.append(tile)
+            remaining = [left - q for q, left in zip(tile.counts, remaining)]
+    chosen.sort(key=lambda tile: -tile.height)
+    
+    # Shelves as (top row, height, [(tile, column)])
+    shelves = []
+    unplaced = []
+    top = x = 0
+    for tile in chosen:
+        monitor.tick(0)
+        if shelves and x + tile.width <= width:
+            shelves[-1][2].append((tile, x))
+            x += tile.width
+        elif (top + (shelves[-1][1] if shelves else 0) + tile.height <= height
+              and tile.width <= width):
+            if shelves:
+                top += shelves[-1][1]
+            shelves.append((top, tile.height, [(tile, 0)]))
+            x = tile.width
+        else:
+            unplaced.append(tile)
+    
+    for tile in unplaced:
+        remaining = [left + q for q, left in zip(tile.counts, remaining)]
+    sizes = [len(all_orientations[shape_id][0]) for shape_id in range(len(demand))]
+    tables = OrderedDict()
+    
+    for kept in range(len(shelves), max(len(shelves) - MACRO_BACKOFF_SHELVES, 0) - 1, -1):
+        band_top = shelves[kept][0] if kept < len(shelves) else (
+            shelves[-1][0] + shelves[-1][1] if shelves else 0)
+        leftover = list(remaining)
+        for _, _, row in shelves[kept:]:
+            for tile, _ in row:
+                leftover = [left + q for q, left in zip(tile.counts, leftover)]
+        band = height - band_top
+        if sum(q * size for q, size in zip(leftover, sizes)) > width * band:
+            continue
+        
+        pieces = []
+        for top, _, row in shelves[:kept]:
+            for tile, column in row:
+                pieces.extend((shape_id, [(r + top, c + column) for r, c in cells])
+                              for shape_id, cells in tile.pieces)
+        shapes = [shape_id for shape_id, quantity in enumerate(leftover) for _ in range(quantity)]
+        if not shapes:
+            return pieces
+        
+        shapes.sort(key=lambda sid: -sizes[sid])
+        monitor.tick(0)
+        fine = []
+        verdict = solve_region(width, band, shapes, all_orientations, 0, verbose=False,
+                               engine="auto",
+                               table=get_placement_table(width, band, all_orientations, tables),
+                               node_limit=MACRO_FINE_NODES, certificate=fine, parent=monitor)
+        if verdict is Verdict.YES:
+            return pieces + [(shape_id, [(r + band_top, c) for r, c in cells])
+                             for shape_id, cells in fine]
+    return None
+
+
+def solve_region_macro(width: int, height: int, shapes_to_place: List[int],
+                       all_orientations: Orientations, table: PlacementTable,
+                       monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Pack the region mostly with macro tiles (see macro_pack), with shelves
+    running along either side. The tiles fix where most pieces go.
+    """
+    demand = [0] * len(all_orientations)
+    for shape_id in shapes_to_place:
+        demand[shape_id] += 1
+    
+    for transposed in (False, True):
+        if transposed:
+            packing = macro_pack(height, width, demand, all_orientations, monitor)
+            if packing is not None:
+                packing = transpose_cells(packing)
+        else:
+            packing = macro_pack(width, height, demand, all_orientations, monitor)
+        if packing is not None:
+            path = []
+            for shape_id, cells in packing:
+                mask = 0
+                for r, c in cells:
+                    mask |= 1 << (r * width + c)
+                path.append((shape_id, mask))
+            return path
+    return None
+
+
+# Rectangle atlas file layout: header, then an (offset, count) index slot
+# per rectangle w x h with 1 <= w <= h <= max side, then the count vectors
+# themselves as unsigned 16-bit fields
+ATLAS_MAGIC = b"D12ATLAS"
+ATLAS_FORMAT = 1
+ATLAS_HEADER = struct.Struct("<8sI32sHHH")
+ATLAS_INDEX = struct.Struct("<II")
+
+# Atlas rectangles of at most this many cells get exact Pareto fronts;
+# larger ones are composed from two smaller ones with a straight cut
+ATLAS_EXACT_AREA = 30
+ATLAS_FRONT_LIMIT = 64
+
+
+def catalog_digest(all_orientations: Orientations) -> bytes:
+    return hashlib.sha256(repr(catalog_key(all_orientations)).encode()).digest()
+
+
+def atlas_slot(w: int, h: int, max_side: int) -> int:
+    """
+    Index slot of the w x h rectangle, w <= h.
+    """
+    return (w - 1) * max_side - (w - 1) * (w - 2) // 2 + (h - w)
+
+
+def atlas_cuts(w: int, h: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    The pairs of sides a straight cut splits w x h into, each as (w, h)
+    with w <= h.
+    """
+    cuts = []
+    for a in range(1, w // 2 + 1):
+        cuts.append((tuple(sorted((a, h))), tuple(sorted((w - a, h)))))
+    for b in range(1, h // 2 + 1):
+        cuts.append((tuple(sorted((w, b))), tuple(sorted((w, h - b)))))
+    return cuts
+
+
+def spread_front(candidates: Set[int], vectors: CountVectors, limit: int,
+                 directions: List[List[float]]) -> List[int]:
+    """
+    Up to `limit` maximal vectors out of `candidates`. The best one along
+    each direction comes first (the weights are positive, so it is never
+    dominated), which keeps every mix of shapes represented; the rest of
+    the room goes to the vectors with the most pieces.
+    """
+    guards = vectors.guards
+    unpacked = {vector: vectors.unpack(vector) for vector in candidates}
+    kept = {}
+    for direction in directions:
+        best = max(unpacked, key=lambda vector: sum(
+            w * q for w, q in zip(direction, unpacked[vector])))
+        kept[best] = True
+    # In order of decreasing size anything dominating a vector comes first
+    for vector in sorted(unpacked, key=lambda vector: -sum(unpacked[vector])):
+        if len(kept) >= limit:
+            break
+        if not any(((known | guards) - vector) & guards == guards for known in kept):
+            kept[vector] = True
+    return list(kept)
+
+
+def build_atlas(all_orientations: Orientations, max_side: int
+                ) -> Dict[Tuple[int, int], List[Tuple[int, ...]]]:
+    """
+    Pareto fronts of count vectors for every rectangle up to max_side.
+
+    Rectangles of at most ATLAS_EXACT_AREA cells are exact: vectors are
+    grown one piece at a time from the empty one, each tested with the
+    frontier engine, and since feasibility is monotone only feasible
+    vectors are grown further. Larger rectangles take the best sums of one
+    vector from each side of every straight cut, kept to the
+    ATLAS_FRONT_LIMIT vectors with the most pieces, so their fronts are
+    sound but not complete. They are picked by spread_front along a fixed
+    set of random directions weighted by shape size.
+    """
+    num_shapes = len(all_orientations)
+    sizes = [len(all_orientations[shape_id][0]) for shape_id in range(num_shapes)]
+    rng = random.Random(0)
+    directions = [[rng.random() * size for size in sizes] for _ in range(ATLAS_FRONT_LIMIT // 2)]
+    vectors = CountVectors(num_shapes, max_side * max_side // min(sizes))
+    packed = {}
+    rectangles = sorted(((w, h) for w in range(1, max_side + 1)
+                         for h in range(w, max_side + 1)), key=lambda dims: dims[0] * dims[1])
+    
+    for w, h in rectangles:
+        if w * h <= ATLAS_EXACT_AREA:
+            table = PlacementTable(w, h, all_orientations)
+            feasible = {(0,) * num_shapes}
+            layer = [(0,) * num_shapes]
+            while layer:
+                grown = []
+                for vector in layer:
+                    for shape_id in range(num_shapes):
+                        bigger = vector[:shape_id] + (vector[shape_id] + 1,) + vector[shape_id + 1:]
+                        if bigger in feasible or sum(
+                                q * size for q, size in zip(bigger, sizes)) > w * h:
+                            continue
+                        # Every vector one piece smaller must be feasible too
+                        if any(bigger[sid] and bigger[:sid] + (bigger[sid] - 1,) + bigger[sid + 1:]
+                               not in feasible for sid in range(num_shapes)):
+                            continue
+                        shapes = [sid for sid, q in enumerate(bigger) for _ in range(q)]
+                        shapes.sort(key=lambda sid: -sizes[sid])
+                        if solve_region(w, h, shapes, all_orientations, 0, verbose=False,
+                                        engine="frontier", table=table) is Verdict.YES:
+                            feasible.add(bigger)
+                            grown.append(bigger)
+                layer = grown
+            front = ParetoFront(vectors, len(feasible))
+            for vector in feasible:
+                front.add(vectors.pack(vector), None)
+            packed[w, h] = list(front.entries)
+        else:
+            candidates = set()
+            for first, second in atlas_cuts(w, h):
+                for a in packed[first]:
+                    candidates.update(a + b for b in packed[second])
+            packed[w, h] = spread_front(candidates, vectors, ATLAS_FRONT_LIMIT, directions)
+    
+    return {dims: sorted(tuple(vectors.unpack(vector)) for vector in front)
+            for dims, front in packed.items()}
+
+
+def write_atlas(path: str, all_orientations: Orientations, max_side: int,
+                fronts: Dict[Tuple[int, int], List[Tuple[int, ...]]]):
+    num_shapes = len(all_orientations)
+    vector = struct.Struct(f"<{num_shapes}H")
+    order = sorted(fronts, key=lambda dims: atlas_slot(*dims, max_side))
+    with open(path, "wb") as f:
+        f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_FORMAT, catalog_digest(all_orientations),
+                                  max_side, num_shapes, ATLAS_EXACT_AREA))
+        offset = 0
+        for dims in order:
+            f.write(ATLAS_INDEX.pack(offset, len(fronts[dims])))
+            offset += len(fronts[dims])
+        for dims in order:
+            for counts in fronts[dims]:
+                f.write(vector.pack(*counts))
+
+
+class RectangleAtlas:
+    """
+    A memory-mapped atlas file written by write_atlas. Opening it only
+    checks the header: a file for another shape catalog or format is
+    rejected with ValueError. Fronts are read from the mapping on demand.
+    """
+
+    def __init__(self, path: str, all_orientations: Orientations):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < ATLAS_HEADER.size:
+            raise ValueError(f"{path} is not a rectangle atlas")
+        magic, version, digest, max_side, num_shapes, exact_area = \
+            ATLAS_HEADER.unpack_from(self.data, 0)
+        if magic != ATLAS_MAGIC or version != ATLAS_FORMAT:
+            raise ValueError(f"{path} is not a rectangle atlas in format {ATLAS_FORMAT}")
+        if digest != catalog_digest(all_orientations):
+            raise ValueError(f"{path} was built for a different shape catalog")
+        self.digest = digest
+        self.max_side = max_side
+        self.exact_area = exact_area
+        self.vector = struct.Struct(f"<{num_shapes}H")
+        self.index_start = ATLAS_HEADER.size
+        self.vectors_start = self.index_start + ATLAS_INDEX.size * (max_side * (max_side + 1) // 2)
+    
+    def front(self, width: int, height: int) -> List[Tuple[int, ...]]:
+        """
+        The count vectors recorded for width x height (either way round),
+        or [] beyond the atlas.
+        """
+        w, h = min(width, height), max(width, height)
+        if w < 1 or h > self.max_side:
+            return []
+        offset, count = ATLAS_INDEX.unpack_from(
+            self.data, self.index_start + ATLAS_INDEX.size * atlas_slot(w, h, self.max_side))
+        start = self.vectors_start + offset * self.vector.size
+        return [self.vector.unpack_from(self.data, start + i * self.vector.size)
+                for i in range(count)]
+
+
+# Open atlases by catalog digest, registered by solve() and the workers
+ATLASES: Dict[bytes, RectangleAtlas] = {}
+
+
+def atlas_packing(atlas: RectangleAtlas, width: int, height: int, counts: Tuple[int, ...],
+                  all_orientations: Orientations, tables: OrderedDict,
+                  monitor: SearchMonitor) -> Optional[list]:
+    """
+    A packing of `counts` in width x height, which some atlas vector for
+    the rectangle must dominate. Follows the cuts the atlas was composed
+    from down to exact rectangles and searches those with the frontier
+    engine, within what is left of `monitor`'s budgets. Returns
+    (shape_id, cells) pairs, or None if the atlas has no matching entry.
+    """
+    if not any(counts):
+        return []
+    if width * height <= atlas.exact_area:
+        shapes = [shape_id for shape_id, quantity in enumerate(counts) for _ in range(quantity)]
+        shapes.sort(key=lambda sid: -len(all_orientations[sid][0]))
+        certificate = []
+        verdict = solve_region(width, height, shapes, all_orientations, 0, verbose=False,
+                               engine="frontier",
+                               table=get_placement_table(width, height, all_orientations, tables),
+                               certificate=certificate, parent=monitor)
+        return certificate if verdict is Verdict.YES else None
+    
+    for a in range(1, width // 2 + 1):
+        cut = ((a, height), (width - a, height), (0, a))
+        packing = atlas_split(atlas, cut, counts, all_orientations, tables, monitor)
+        if packing is not None:
+            return packing
+    for b in range(1, height // 2 + 1):
+        cut = ((width, b), (width, height - b), (b, 0))
+        packing = atlas_split(atlas, cut, counts, all_orientations, tables, monitor)
+        if packing is not None:
+            return packing
+    return None
+
+
+def atlas_split(atlas: RectangleAtlas, cut: Tuple, counts: Tuple[int, ...],
+                all_orientations: Orientations, tables: OrderedDict,
+                monitor: SearchMonitor) -> Optional[list]:
+    """
+    atlas_packing across one cut, given as (first dims, second dims,
+    offset of the second part).
+    """
+    first_dims, second_dims, (dr, dc) = cut
+    second_front = atlas.front(*second_dims)
+    for a in atlas.front(*first_dims):
+        monitor.tick(0)
+        monitor.time_left()
+        first_counts = tuple(min(q, x) for q, x in zip(counts, a))
+        second_counts = tuple(q - x for q, x in zip(counts, first_counts))
+        if not any(all(x >= y for x, y in zip(b, second_counts)) for b in second_front):
+            continue
+        first = atlas_packing(atlas, *first_dims, first_counts, all_orientations, tables,
+                              monitor)
+        if first is None:
+            continue
+        second = atlas_packing(atlas, *second_dims, second_counts, all_orientations, tables,
+                               monitor)
+        if second is None:
+            continue
+        return first + [(shape_id, [(r + dr, c + dc) for r, c in cells])
+                        for shape_id, cells in second]
+    return None
+
+
+def solve_region_atlas(width: int, height: int, shapes_to_place: List[int],
+                       all_orientations: Orientations, table: PlacementTable,
+                       monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Compose the region from rectangle atlas entries instead of searching.
+
+    The region is cut into a grid of near-equal tiles no larger than the
+    atlas, a multiset knapsack picks one atlas vector per tile covering the
+    demand, and atlas_packing lays out each tile. Needs an atlas for the
+    catalog in ATLASES (see solve's `atlas_path`). The fronts are only
+    lower bounds on what each tile can hold.
+    """
+    atlas = ATLASES.get(catalog_digest(all_orientations))
+    if atlas is None:
+        raise ValueError("The atlas engine needs a rectangle atlas for this "
+                         "shape catalog (see --atlas)")
+    
+    num_shapes = len(all_orientations)
+    demand = [0] * num_shapes
+    for shape_id in shapes_to_place:
+        demand[shape_id] += 1
+    
+    def split(length: int) -> List[int]:
+        parts = -(-length // atlas.max_side)
+        return [length // parts + (i < length % parts) for i in range(parts)]
+    
+    tiles = []
+    top = 0
+    for tile_height in split(height):
+        left = 0
+        for tile_width in split(width):
+            tiles.append((top, left, tile_width, tile_height))
+            left += tile_width
+        top += tile_height
+    
+    fronts = [atlas.front(tile_width, tile_height) for _, _, tile_width, tile_height in tiles]
+    largest = max([max(demand)] + [max(vector) for front in fronts for vector in front])
+    vectors = CountVectors(num_shapes, largest)
+    packed_demand = vectors.pack(demand)
+    
+    # Knapsack over the tiles, as in the strip engine
+    combined = ParetoFront(vectors, STRIP_FRONT_LIMIT)
+    combined.add(0, None)
+    covered = 0
+    for (_, _, tile_width, tile_height), front in zip(tiles, fronts):
+        next_combined = ParetoFront(vectors, STRIP_FRONT_LIMIT)
+        for total, chain in combined.entries.items():
+            for counts in front:
+                monitor.tick(0)
+                next_combined.add(vectors.capped_sum(total, vectors.pack(counts), packed_demand),
+                                  (counts, chain))
+        covered += tile_width * tile_height
+        next_combined.trim([quantity * covered / (width * height) for quantity in demand])
+        combined = next_combined
+    if packed_demand not in combined.entries:
+        return None
+    
+    chosen = []
+    chain = combined.entries[packed_demand]
+    while chain is not None:
+        counts, chain = chain
+        chosen.append(counts)
+    chosen.reverse()
+    
+    path = []
+    remaining = list(demand)
+    tables = OrderedDict()
+    for (top, left, tile_width, tile_height), counts in zip(tiles, chosen):
+        wanted = tuple(min(q, left_over) for q, left_over in zip(counts, remaining))
+        remaining = [left_over - q for q, left_over in zip(wanted, remaining)]
+        monitor.tick(0)
+        # Atlas entries are stored with width <= height
+        transposed = tile_width > tile_height
+        packing = atlas_packing(atlas, min(tile_width, tile_height), max(tile_width, tile_height),
+                                wanted, all_orientations, tables, monitor)
+        if packing is None:
+            return None
+        if transposed:
+            packing = transpose_cells(packing)
+        for shape_id, cells in packing:
+            mask = 0
+            for r, c in cells:
+                mask |= 1 << ((r + top) * width + c + left)
+            path.append((shape_id, mask))
+    return path
+
+
+# Moves the anneal engine makes before giving up, unless a budget stops it
+# first
+ANNEAL_STEPS = 20_000
+
+# A move clears the pieces within this many cells of a free cell
+ANNEAL_RADIUS = 2
+
+# Starting temperature and its decay per move: a move that ends with d
+# fewer pieces placed is kept with probability exp(-d / temperature)
+ANNEAL_TEMPERATURE = 0.5
+ANNEAL_COOLING = 0.9998
+
+
+def solve_region_anneal(width: int, height: int, shapes_to_place: List[int],
+                        all_orientations: Orientations, table: PlacementTable,
+                        monitor: SearchMonitor, options: SearchOptions) -> Optional[Solution]:
+    """
+    Local search for a packing, by simulated annealing.
+
+    Starts from greedy_pack's partial packing. Each move picks a free cell
+    at random, lifts the pieces within ANNEAL_RADIUS cells of it and
+    refills the hole with placements of the missing shapes, in random
+    order. A move that places at least as many pieces as before is kept,
+    a worse one only with the annealing probability. Moves are drawn from
+    random.Random(`options.seed`), so a run can be replayed. Gives up
+    after ANNEAL_STEPS moves.
+    """
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in set(shapes_to_place)}
+    if sum(sizes[shape_id] for shape_id in shapes_to_place) > width * height:
+        return None
+    
+    rng = random.Random(options.seed)
+    masks = table.masks
+    shape_of = table.shape_of
+    by_cell = table.by_cell
+    remaining: Dict[int, int] = {}
+    for shape_id in shapes_to_place:
+        remaining[shape_id] = remaining.get(shape_id, 0) + 1
+    
+    # Placed pieces by mask, and the mask of the piece on each cell
+    pieces: Dict[int, int] = {}
+    piece_on = [0] * (width * height)
+    board = 0
+    
+    def place(shape_id: int, mask: int):
+        nonlocal board
+        board |= mask
+        remaining[shape_id] -= 1
+        pieces[mask] = shape_id
+        cells = mask
+        while cells:
+            low = cells & -cells
+            piece_on[low.bit_length() - 1] = mask
+            cells ^= low
+        monitor.nodes += 1
+    
+    def lift(mask: int):
+        nonlocal board
+        board ^= mask
+        remaining[pieces.pop(mask)] += 1
+    
+    def refill(hole: int) -> List[int]:
+        # Place missing shapes over the hole's cells, in random order
+        candidates = set()
+        while hole:
+            low = hole & -hole
+            candidates.update(by_cell[low.bit_length() - 1])
+            hole ^= low
+        candidates = list(candidates)
+        rng.shuffle(candidates)
+        added = []
+        for index in candidates:
+            shape_id = shape_of[index]
+            if remaining.get(shape_id) and not board & masks[index]:
+                place(shape_id, masks[index])
+                added.append(masks[index])
+        return added
+    
+    for shape_id, mask in greedy_pack(width, height, shapes_to_place, all_orientations,
+                                      table, partial=True):
+        place(shape_id, mask)
+    
+    temperature = ANNEAL_TEMPERATURE
+    for _ in range(ANNEAL_STEPS):
+        if len(pieces) == len(shapes_to_place):
+            break
+        monitor.tick(len(pieces))
+        # A move takes far longer than a placement attempt, so the clock
+        # is read every time rather than every 4096 ticks
+        monitor.time_left()
+        
+        cell = rng.randrange(width * height)
+        while board >> cell & 1:
+            cell = rng.randrange(width * height)
+        area = 1 << cell
+        for _ in range(ANNEAL_RADIUS):
+            area = table.grow(area)
+        
+        hole = area
+        lifted = []
+        cells = area & board
+        while cells:
+            mask = piece_on[(cells & -cells).bit_length() - 1]
+            lifted.append((pieces[mask], mask))
+            lift(mask)
+            hole |= mask
+            cells &= ~mask
+        
+        added = refill(hole)
+        loss = len(lifted) - len(added)
+        if loss > 0 and rng.random() >= math.exp(-loss / temperature):
+            for mask in added:
+                lift(mask)
+            for shape_id, mask in lifted:
+                place(shape_id, mask)
+        temperature *= ANNEAL_COOLING
+    
+    if len(pieces) < len(shapes_to_place):
+        return None
+    return [(shape_id, mask) for mask, shape_id in pieces.items()]
+
+
+# Every engine takes (width, height, shapes_to_place, all_orientations,
+# table, monitor, options) and returns the placed pieces as a Solution, or
+# None if they cannot all fit.
+ENGINES = {
+    "grid": solve_region_grid,
+    "bitboard": solve_region_bitboard,
+    "dlx": solve_region_dlx,
+    "cell": solve_region_cell,
+    "strips": solve_region_strips,
+    "frontier": solve_region_frontier,
+    "guillotine": solve_region_guillotine,
+    "macro": solve_region_macro,
+    "atlas": solve_region_atlas,
+    "anneal": solve_region_anneal,
+}
+
+# Engines that only look for a packing of a restricted form, or give up
+# after a fixed effort, and can miss one that exists. They can only prove
+# a region solvable: for them None means UNKNOWN.
+INCOMPLETE_ENGINES = {"strips", "guillotine", "macro", "atlas", "anneal"}
+
+# With engine="auto", regions at or above this fill use Dancing Links and
+# the rest use the plain bitboard backtracker, which finds loose packings
+# quickly without building the link structure.
+DLX_FILL_THRESHOLD = 0.8
+
+# With engine="auto", regions no wider than this on their short side use
+# the frontier engine, whose state count grows with that side only
+FRONTIER_AUTO_WIDTH = 6
+
+
+def solution_cells(solution: Solution, width: int) -> List[Tuple[int, List[Tuple[int, int]]]]:
+    """
+    Convert an engine's (shape_id, mask) pairs into (shape_id, cells) with
+    cells as sorted (row, col) tuples, a form that does not depend on the
+    region's bit layout.
+    """
+    pieces = []
+    for shape_id, mask in solution:
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(divmod(low.bit_length() - 1, width))
+            mask ^= low
+        pieces.append((shape_id, cells))
+    return pieces
+
+
+def greedy_pack(width: int, height: int, shapes_to_place: List[int],
+                all_orientations: Orientations, table: PlacementTable,
+                partial: bool = False, by_columns: bool = False) -> Optional[Solution]:
+    """
+    Pack the shapes in a single greedy pass, without backtracking.
+
+    Cells are filled in row-major order: the first empty cell gets the
+    placement anchored there that leaves the fewest free cells around it
+    (so pieces nestle against the walls and each other), taking larger
+    shapes first; a cell no placement fits is left empty. Returns the
+    packing, or None once more cells are left empty than the region can
+    spare. It never proves that a region cannot be packed. With `partial`
+    it keeps going past that point and returns whatever it placed. With
+    `by_columns` cells are filled in column-major order instead, anchoring
+    placements by PlacementTable.column_anchored.
+    """
+    remaining: Dict[int, int] = {}
+    for shape_id in shapes_to_place:
+        remaining[shape_id] = remaining.get(shape_id, 0) + 1
+    sizes = {shape_id: len(all_orientations[shape_id][0]) for shape_id in remaining}
+    slack = width * height - sum(sizes[shape_id] for shape_id in shapes_to_place)
+    if slack < 0 and not partial:
+        return None
+    
+    masks = table.masks
+    shape_of = table.shape_of
+    board = 0
+    left = len(shapes_to_place)
+    solution = []
+    if by_columns:
+        anchored = table.column_anchored
+        order = [r * width + c for c in range(width) for r in range(height)]
+    else:
+        anchored = table.anchored
+        order = range(width * height)
+    for cell in order:
+        indices = anchored[cell]
+        if not left:
+            break
+        if board >> cell & 1:
+            continue
+        
+        best = None
+        best_key = None
+        for index in indices:
+            shape_id = shape_of[index]
+            if remaining.get(shape_id) and not board & masks[index]:
+                mask = masks[index]
+                exposed = (table.grow(mask) & ~mask & ~board).bit_count()
+                key = (sizes[shape_id], -exposed)
+                if best_key is None or key > best_key:
+                    best, best_key = index, key
+        
+        if best is None:
+            slack -= 1
+            if slack < 0 and not partial:
+                return None
+            board |= 1 << cell
+            continue
+        
+        shape_id = shape_of[best]
+        board |= masks[best]
+        remaining[shape_id] -= 1
+        left -= 1
+        solution.append((shape_id, masks[best]))
+    return solution if not left or partial else None
+
+
+def solve_region(width: int, height: int, shapes_to_place: List[int],
+                 all_orientations: Dict[int, List[FrozenSet[Tuple[int, int]]]],
+                 region_num: int, verbose: bool = True,
+                 engine: str = "grid",
+                 table: Optional[PlacementTable] = None,
+                 time_limit: Optional[float] = None,
+                 node_limit: Optional[int] = None,
+                 certificate: Optional[list] = None,
+                 options: Optional[SearchOptions] = None,
+                 parent: Optional[SearchMonitor] = None) -> Verdict:
+    """
+    Determine if all shapes can be placed in a region using backtracking.
+
+    `engine` selects the search: "grid" (list of lists), "bitboard" (one
+    int bitmask), "dlx" (Dancing Links exact cover), "cell" (first empty
+    cell with a slack budget), "strips" (strip dynamic programming),
+    "frontier" (broken-profile dynamic programming), "guillotine"
+    (recursive straight cuts), "macro" (macro tiles, then a fine search),
+    "atlas" (composed from a rectangle atlas), "anneal" (local search by
+    simulated annealing) or "auto" (bitboard if `options` ask for
+    restarts or backjumping, else frontier for regions at most
+    FRONTIER_AUTO_WIDTH on their short side, dlx for regions filled to at
+    least DLX_FILL_THRESHOLD and bitboard otherwise).
+    All engines give the same answer, except that the ones in
+    INCOMPLETE_ENGINES answer UNKNOWN where the others answer NO and
+    sometimes where they answer YES.
+    `table` is a precomputed PlacementTable for this region size; the
+    table-based engines build one if it is not given.
+    `options` holds the engine switches (see SearchOptions); None uses the
+    defaults.
+    The log line at the end reports placement attempts and, where the
+    engine keeps them, pieces placed and table hits, to compare settings
+    by.
+    `time_limit` (seconds) and `node_limit` (placement attempts) bound the
+    search; if either runs out first the verdict is UNKNOWN.
+    If a `certificate` list is given, a YES verdict appends the packing to
+    it as (shape_id, cells) pairs, see solution_cells.
+    `parent` is the monitor of an engine handing part of its region to
+    this search: the limits are cut down to what is left of its budgets
+    and the placement attempts made are charged to it.
+    """
+    if not shapes_to_place:
+        return Verdict.YES
+    
+    if options is None:
+        options = SearchOptions()
+    if engine == "auto":
+        cells_needed = sum(len(all_orientations[sid][0]) for sid in shapes_to_place)
+        fill = cells_needed / (width * height)
+        # Only the bitboard engine restarts and backjumps
+        if options.restarts or options.backjump:
+            engine = "bitboard"
+        elif min(width, height) <= FRONTIER_AUTO_WIDTH:
+            engine = "frontier"
+        else:
+            engine = "dlx" if fill >= DLX_FILL_THRESHOLD else "bitboard"
+    
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of "
+                         f"{sorted(ENGINES) + ['auto']}")
+    
+    if table is None and engine != "grid":
+        table = PlacementTable(width, height, all_orientations)
+    
+    if parent is not None:
+        time_left = parent.time_left()
+        if time_left is not None:
+            time_limit = time_left if time_limit is None else min(time_limit, time_left)
+        nodes_left = parent.nodes_left()
+        if nodes_left is not None:
+            node_limit = nodes_left if node_limit is None else min(node_limit, nodes_left)
+    monitor = SearchMonitor(len(shapes_to_place), verbose,
+                            time_limit=time_limit, node_limit=node_limit)
+    try:
+        solution = ENGINES[engine](width, height, shapes_to_place, all_orientations,
+                                   table, monitor, options)
+    except SearchBudgetExceeded as exceeded:
+        if verbose:
+            log(f"      Gave up at the {exceeded} after {monitor.elapsed():.2f}s and "
+                f"{monitor.attempts - 1:,} placement attempts{monitor.counters()}")
+        return Verdict.UNKNOWN
+    finally:
+        # A search that overran its node limit counted one attempt past it
+        if parent is not None:
+            parent.attempts += min(monitor.attempts, monitor.node_limit)
+    
+    if verbose:
+        log(f"      Completed in {monitor.elapsed():.2f}s after {monitor.attempts:,} placement "
+            f"attempts{monitor.counters()}")
+    
+    if solution is None:
+        return Verdict.UNKNOWN if engine in INCOMPLETE_ENGINES else Verdict.NO
+    if certificate is not None:
+        certificate.extend(solution_cells(solution, width))
+    return Verdict.YES
+
+
+def triage_area(width: int, height: int, counts: List[int],
+                all_orientations: Orientations) -> Optional[bool]:
+    """
+    No if the shapes need more cells than the region has.
+    """
+    cells_needed = sum(quantity * len(all_orientations[shape_id][0])
+                       for shape_id, quantity in enumerate(counts))
+    if cells_needed > width * height:
+        return False
+    return None
+
+
+def triage_fit(width: int, height: int, counts: List[int],
+               all_orientations: Orientations) -> Optional[bool]:
+    """
+    No if some needed shape has no orientation that fits in the region.
+    """
+    for shape_id, quantity in enumerate(counts):
+        if quantity and not any(
+            max(r for r, c in o) < height and max(c for r, c in o) < width
+            for o in all_orientations[shape_id]
+        ):
+            return False
+    return None
+
+
+def triage_boxes(width: int, height: int, counts: List[int],
+                 all_orientations: Orientations) -> Optional[bool]:
+    """
+    Yes if every piece can get a square box of its own: with every needed
+    shape fitting an s x s box, (width // s) * (height // s) boxes tile the
+    region without overlap.
+    """
+    needed = [shape_id for shape_id, quantity in enumerate(counts) if quantity]
+    if not needed:
+        return True
+    side = max(
+        min(max(max(r for r, c in o), max(c for r, c in o)) + 1
+            for o in all_orientations[shape_id])
+        for shape_id in needed
+    )
+    if sum(counts) <= (width // side) * (height // side):
+        return True
+    return None
+
+
+# Sound bounds tried in order before any search; the first one that returns
+# True or False decides the region.
+TRIAGE_TIERS = [
+    ("area", triage_area),
+    ("fit", triage_fit),
+    ("boxes", triage_boxes),
+]
+
+
+def region_signature(width: int, height: int, counts: List[int],
+                     all_orientations: Orientations) -> str:
+    """
+    Canonical hash of a region: the shape catalog's orientation sets, the
+    dimensions ordered so width <= height, and the counts vector without
+    trailing zeros.
+    """
+    counts = list(counts)
+    while counts and counts[-1] == 0:
+        counts.pop()
+    key = (catalog_key(all_orientations), min(width, height), max(width, height),
+           tuple(counts))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def transpose_cells(certificate: list) -> list:
+    """
+    Mirror a (shape_id, cells) packing across the main diagonal.
+    """
+    return [(shape_id, [(c, r) for r, c in cells]) for shape_id, cells in certificate]
+
+
+class ResultCache:
+    """
+    Persistent store of searched region verdicts, shared across runs and
+    input files.
+
+    Entries live in an SQLite database keyed by region_signature, with the
+    verdict and, for YES, the packing as a certificate. Certificates are
+    stored for the width <= height orientation of the region and
+    transposed on the way in and out. Once the table holds more than
+    `max_entries` rows, the least recently used tenth is evicted.
+    Several processes may share one file: the database runs in WAL mode,
+    writers take the lock up front with BEGIN IMMEDIATE, and a busy
+    database is waited on rather than failing.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, verdict TEXT NOT NULL,"
+            " certificate TEXT, last_used REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+    
+    def get(self, width: int, height: int, counts: List[int],
+            all_orientations: Orientations) -> Optional[Tuple[Verdict, Optional[list]]]:
+        """
+        The cached (verdict, certificate) for a region, or None.
+        """
+        key = region_signature(width, height, counts, all_orientations)
+        row = self.conn.execute(
+            "SELECT verdict, certificate FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        
+        self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?",
+                          (time.time(), key))
+        verdict = Verdict(row[0])
+        certificate = None
+        if row[1] is not None:
+            certificate = [(shape_id, [tuple(cell) for cell in cells])
+                           for shape_id, cells in json.loads(row[1])]
+            if width > height:
+                certificate = transpose_cells(certificate)
+        return verdict, certificate
+    
+    def put(self, width: int, height: int, counts: List[int],
+            all_orientations: Orientations, verdict: Verdict,
+            certificate: Optional[list] = None):
+        """
+        Store a decided verdict (UNKNOWN is never cached).
+        """
+        if verdict is Verdict.UNKNOWN:
+            return
+        key = region_signature(width, height, counts, all_orientations)
+        if certificate is not None:
+            if width > height:
+                certificate = transpose_cells(certificate)
+            certificate = json.dumps(certificate)
+        
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, verdict.value, certificate, time.time()))
+            (size,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if size > self.max_entries:
+                excess = size - self.max_entries + self.max_entries // 10
+                self.conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+
+def dominates(a: Tuple[int, ...], b: Tuple[int, ...]) -> bool:
+    """
+    True if count vector `a` is at least `b` in every component.
+    """
+    return all(x >= y for x, y in zip(a, b))
+
+
+class DominanceIndex:
+    """
+    Verdicts implied by monotonicity: if a multiset of shapes packs into a
+    rectangle then every sub-multiset packs into every rectangle containing
+    it, and if it does not then no super-multiset packs into any rectangle
+    it contains.
+
+    For each rectangle (up to transposition) the index keeps two
+    antichains: the maximal count vectors known to fit, each with its
+    packing if one is known, and the minimal count vectors known not to.
+    A query scans the rectangles on the right side of the queried one.
+    Packings are stored for the width <= height orientation, like in
+    ResultCache.
+    """
+
+    def __init__(self, all_orientations: Orientations):
+        self.num_shapes = len(all_orientations)
+        self.solvable: Dict[Tuple[int, int], List[Tuple[Tuple[int, ...], Optional[list]]]] = {}
+        self.unsolvable: Dict[Tuple[int, int], List[Tuple[int, ...]]] = {}
+    
+    def _vector(self, counts: List[int]) -> Tuple[int, ...]:
+        return tuple(counts) + (0,) * (self.num_shapes - len(counts))
+    
+    def query(self, width: int, height: int, counts: List[int]
+              ) -> Optional[Tuple[Verdict, Optional[list], Tuple[int, int]]]:
+        """
+        (verdict, certificate, (w, h)) if a recorded region in w x h implies
+        a verdict, otherwise None. For YES the certificate is the recorded
+        packing trimmed to `counts` and oriented for width x height, or None
+        if the region was decided without one.
+        """
+        short, long = min(width, height), max(width, height)
+        vector = self._vector(counts)
+        for (w, h), front in self.solvable.items():
+            if w <= short and h <= long:
+                for known, certificate in front:
+                    if dominates(known, vector):
+                        if certificate is not None:
+                            certificate = self._trim(certificate, vector)
+                            if width > height:
+                                certificate = transpose_cells(certificate)
+                        return Verdict.YES, certificate, (w, h)
+        for (w, h), front in self.unsolvable.items():
+            if w >= short and h >= long:
+                if any(dominates(vector, known) for known in front):
+                    return Verdict.NO, None, (w, h)
+        return None
+    
+    @staticmethod
+    def _trim(certificate: list, vector: Tuple[int, ...]) -> list:
+        """
+        Drop the pieces beyond the wanted count of each shape.
+        """
+        remaining = list(vector)
+        trimmed = []
+        for shape_id, cells in certificate:
+            if remaining[shape_id]:
+                remaining[shape_id] -= 1
+                trimmed.append((shape_id, cells))
+        return trimmed
+    
+    def add(self, width: int, height: int, counts: List[int], verdict: Verdict,
+            certificate: Optional[list] = None):
+        """
+        Record a decided region (UNKNOWN is ignored), with its packing as a
+        (shape_id, cells) list if it was solved by search.
+        """
+        if verdict is Verdict.UNKNOWN:
+            return
+        key = (min(width, height), max(width, height))
+        vector = self._vector(counts)
+        if verdict is Verdict.YES:
+            if certificate is not None and width > height:
+                certificate = transpose_cells(certificate)
+            front = self.solvable.setdefault(key, [])
+            for i, (known, known_certificate) in enumerate(front):
+                if dominates(known, vector):
+                    # A packing for a vector first decided without one
+                    if known == vector and known_certificate is None:
+                        front[i] = (known, certificate)
+                    return
+            front[:] = [(known, known_certificate) for known, known_certificate in front
+                        if not dominates(vector, known)]
+            front.append((vector, certificate))
+        else:
+            front = self.unsolvable.setdefault(key, [])
+            if any(dominates(vector, known) for known in front):
+                return
+            front[:] = [known for known in front if not dominates(known, vector)]
+            front.append(vector)
+
+
+def check_region(region_num: int, total_regions: int, width: int, height: int,
+                 counts: List[int], all_orientations: Orientations,
+                 engine: str, triage: List,
+                 placement_tables: OrderedDict,
+                 time_limit: Optional[float] = None,
+                 node_limit: Optional[int] = None,
+                 cache: Optional[ResultCache] = None,
+                 dominance: Optional[DominanceIndex] = None,
+                 certificate: Optional[list] = None,
+                 options: Optional[SearchOptions] = None,
+                 greedy: bool = True,
+                 greedy_stats: Optional[Dict[str, float]] = None) -> Tuple[Verdict, Optional[str]]:
+    """
+    Log and decide a single region.
+
+    Returns (verdict, tier): `tier` names the triage tier that decided the
+    region, "trivial" when there was nothing to place, "cache" for a
+    ResultCache hit, "dominance" for a DominanceIndex answer, "greedy" for
+    a packing found by greedy_pack, or None if it had to be searched. The
+    search budgets are passed to solve_region, and searched verdicts are
+    stored in the cache. The dominance index is only read here; the caller
+    records decided regions in it.
+    If a `certificate` list is given, a YES verdict appends the packing to
+    it when one is known, as solve_region does, which is also handed the
+    search `options`.
+    With `greedy`, regions that get this far first go through greedy_pack,
+    filling by rows and then by columns, and are only searched if neither
+    packs them. Each such try adds 1 to `greedy_stats["tried"]` and its
+    time to `greedy_stats["seconds"]`.
+    """
+    log(f"Region {region_num}/{total_regions}: {width}x{height} grid ({width * height} cells)")
+    
+    # Build list of shapes to place
+    shapes_to_place = []
+    shape_summary = []
+    for shape_id, quantity in enumerate(counts):
+        if quantity > 0:
+            shapes_to_place.extend([shape_id] * quantity)
+            shape_summary.append(f"{quantity}x shape{shape_id}")
+    
+    if shape_summary:
+        log(f"  Shapes needed: {', '.join(shape_summary)}")
+    else:
+        log(f"  Shapes needed: none")
+    
+    log(f"  Total shapes to place: {len(shapes_to_place)}")
+    
+    # Calculate cells needed
+    total_cells_needed = sum(
+        len(list(all_orientations[sid])[0]) for sid in shapes_to_place
+    )
+    total_cells_available = width * height
+    fill_percentage = (total_cells_needed / total_cells_available * 100) if total_cells_available > 0 else 0
+    
+    log(f"  Cells needed: {total_cells_needed} / {total_cells_available} available ({fill_percentage:.1f}% fill)")
+    
+    if not shapes_to_place:
+        log(f"  [OK] TRIVIAL - No shapes to place!")
+        log()
+        return Verdict.YES, "trivial"
+    
+    # Results from earlier runs first
+    if cache is not None:
+        cached = cache.get(width, height, counts, all_orientations)
+        if cached is not None:
+            if certificate is not None and cached[1] is not None:
+                certificate.extend(cached[1])
+            if cached[0] is Verdict.YES:
+                log("  [OK] CACHED - All shapes fit!")
+            else:
+                log("  [X] CACHED - Cannot fit all shapes")
+            log()
+            return cached[0], "cache"
+    
+    # Cheap sound bounds
+    for name, tier in triage:
+        verdict = tier(width, height, counts, all_orientations)
+        if verdict is not None:
+            if verdict:
+                log(f"  [OK] TRIAGE ({name}) - All shapes fit!")
+            else:
+                log(f"  [X] TRIAGE ({name}) - Cannot fit all shapes")
+            log()
+            return (Verdict.YES if verdict else Verdict.NO), name
+    
+    # Verdicts implied by regions decided earlier
+    implied = dominance.query(width, height, counts) if dominance is not None else None
+    if implied is not None:
+        verdict, packing, (w, h) = implied
+        if verdict is Verdict.YES:
+            log(f"  [OK] DOMINATED - A superset of these shapes fits in {w}x{h}!")
+            if certificate is not None and packing is not None:
+                certificate.extend(packing)
+        else:
+            log(f"  [X] DOMINATED - A subset of these shapes cannot fit in {w}x{h}")
+        log()
+        return verdict, "dominance"
+    
+    if greedy:
+        started = time.time()
+        packing = None
+        # In a square region a fill by columns is just a transposed fill
+        # by rows, so only non-square regions try both
+        table = get_placement_table(width, height, all_orientations, placement_tables)
+        for by_columns in (False, True) if width != height else (False,):
+            solution = greedy_pack(width, height, shapes_to_place, all_orientations, table,
+                                   by_columns=by_columns)
+            if solution is not None:
+                packing = solution_cells(solution, width)
+                break
+        elapsed = time.time() - started
+        if greedy_stats is not None:
+            greedy_stats["tried"] = greedy_stats.get("tried", 0) + 1
+            greedy_stats["seconds"] = greedy_stats.get("seconds", 0.0) + elapsed
+        if packing is not None:
+            log(f"  [OK] GREEDY - All shapes fit! (packed in {elapsed * 1000:.1f}ms)")
+            log()
+            if certificate is not None:
+                certificate.extend(packing)
+            return Verdict.YES, "greedy"
+    
+    # Sort shapes by size (largest first) for better pruning
+    shapes_to_place.sort(
+        key=lambda sid: -len(list(all_orientations[sid])[0])
+    )
+    
+    log(f"  Solving (largest shapes first, {engine} engine)...")
+    
+    table = None
+    if engine != "grid":
+        table = get_placement_table(width, height, all_orientations,
+                                    placement_tables)
+    
+    # Try to solve
+    packing = []
+    verdict = solve_region(width, height, shapes_to_place, all_orientations,
+                           region_num, engine=engine, table=table,
+                           time_limit=time_limit, node_limit=node_limit,
+                           certificate=packing, options=options)
+    if cache is not None:
+        cache.put(width, height, counts, all_orientations, verdict,
+                  packing if verdict is Verdict.YES else None)
+    if certificate is not None:
+        certificate.extend(packing)
+    if verdict is Verdict.YES:
+        log(f"  [OK] SUCCESS - All shapes fit!")
+    elif verdict is Verdict.NO:
+        log(f"  [X] FAILED - Cannot fit all shapes")
+    else:
+        log("  [?] UNKNOWN - No verdict from the search")
+    
+    log()
+    return verdict, None
+
+
+# Per-process state for parallel solving, set once by init_worker so the
+# shape catalog is not pickled with every task
+WORKER_STATE: Dict = {}
+
+
+def init_worker(all_orientations: Orientations, engine: str, triage: List,
+                cache_path: Optional[str] = None, cache_max_entries: int = 100_000,
+                atlas_path: Optional[str] = None, options: Optional[SearchOptions] = None):
+    cache = None if cache_path is None else ResultCache(cache_path, cache_max_entries)
+    if atlas_path is not None:
+        atlas = RectangleAtlas(atlas_path, all_orientations)
+        ATLASES[atlas.digest] = atlas
+    WORKER_STATE.update(all_orientations=all_orientations, engine=engine,
+                        triage=triage, placement_tables=OrderedDict(), cache=cache,
+                        dominance=DominanceIndex(all_orientations),
+                        options=options)
+
+
+def check_region_worker(task: Tuple):
+    """
+    Run check_region in a worker process, capturing its log lines.
+    Returns (region_idx, verdict, tier, output, certificate, greedy_stats),
+    the certificate being None unless a packing is known.
+
+    Each worker also keeps its own DominanceIndex of the regions it
+    decided; solve answers what the regions decided so far imply before
+    handing a region to a worker.
+    """
+    region_idx, total_regions, width, height, counts, time_limit, node_limit, greedy = task
+    buffer = io.StringIO()
+    certificate = []
+    greedy_stats = {}
+    with contextlib.redirect_stdout(buffer):
+        verdict, tier = check_region(
+            region_idx + 1, total_regions, width, height, counts,
+            WORKER_STATE["all_orientations"], WORKER_STATE["engine"],
+            WORKER_STATE["triage"], WORKER_STATE["placement_tables"],
+            time_limit, node_limit, WORKER_STATE["cache"],
+            WORKER_STATE["dominance"], certificate, WORKER_STATE["options"],
+            greedy, greedy_stats)
+    certificate = certificate or None
+    WORKER_STATE["dominance"].add(width, height, counts, verdict, certificate)
+    return region_idx, verdict, tier, buffer.getvalue(), certificate, greedy_stats
+
+
+def solve(input_text: str, engine: str = "auto",
+          triage: Optional[List] = None, jobs: int = 1,
+          ordered: bool = True, time_limit: Optional[float] = None,
+          node_limit: Optional[int] = None, retries: int = 0,
+          retry_scale: float = 10.0, cache_path: Optional[str] = None,
+          cache_max_entries: int = 100_000, atlas_path: Optional[str] = None,
+          options: Optional[SearchOptions] = None, greedy: bool = True) -> int:
+    """
+    Main solver function. Can be called from R with input text.
+    Returns the number of solvable regions.
+
+    `engine` is passed through to solve_region ("grid", "bitboard",
+    "dlx", "cell", "strips", "frontier", "guillotine", "macro", "atlas",
+    "anneal" or "auto"). `triage` is a list of (name, function)
+    tiers, each taking (width, height, counts, all_orientations) and
+    returning True/False to decide the region or None to pass it on;
+    it defaults to TRIAGE_TIERS. Only regions no tier decides are
+    searched.
+
+    With `jobs` > 1, regions are fanned out to a process pool. Each
+    region's log lines are printed as one block, in input order if
+    `ordered`, otherwise as soon as the region finishes.
+
+    `time_limit` and `node_limit` bound the search per region. Regions
+    that run out are reported as undecided and, with `retries`, searched
+    again up to that many times with both budgets multiplied by
+    `retry_scale` each round. Undecided regions do not count as solvable.
+
+    `cache_path` names a ResultCache database that is consulted before
+    triage and search and updated with every searched verdict.
+
+    Every decided region is recorded in a DominanceIndex, which answers
+    later regions whose counts lie below a fit in a rectangle they contain,
+    or above a failure in a rectangle containing them, without searching.
+
+    `atlas_path` names a rectangle atlas file (see build_atlas) for the
+    "atlas" engine; one built for another shape catalog is rejected.
+
+    `options` is passed through to solve_region for every region, so a
+    run with the same `options.seed` can be replayed (see SearchOptions).
+
+    With `greedy`, regions left after triage and dominance are first
+    tried with greedy_pack; the summary gives how many it packed and the
+    time it took.
+    """
+    if triage is None:
+        triage = TRIAGE_TIERS
+    
+    log()
+    log("*" * 60)
+    log("*  ELF PRESENT FITTING PUZZLE SOLVER                       *")
+    log("*" * 60)
+    log()
+    
+    # Parse input
+    shapes_raw, regions = parse_input(input_text)
+    
+    # Display shapes
+    log("=" * 60)
+    log("ANALYZING SHAPES...")
+    log("=" * 60)
+    
+    all_orientations = {}
+    for shape_id, shape_lines in shapes_raw.items():
+        coords = shape_to_coords(shape_lines)
+        orientations = get_all_orientations(coords)
+        all_orientations[shape_id] = orientations
+        
+        num_cells = len(coords)
+        log(f"  Shape {shape_id}: {num_cells} cells, {len(orientations)} unique orientations")
+    log()
+    
+    if atlas_path is not None:
+        atlas = RectangleAtlas(atlas_path, all_orientations)
+        ATLASES[atlas.digest] = atlas
+        log(f"  Rectangle atlas: {atlas_path} (up to {atlas.max_side}x{atlas.max_side})")
+        log()
+    
+    # Process regions
+    log("=" * 60)
+    log("CHECKING REGIONS...")
+    log("=" * 60)
+    log()
+    
+    solvable_count = 0
+    total_regions = len(regions)
+    
+    # How many regions each triage tier decided, and how many were searched
+    triage_counts = {name: 0 for name, _ in triage}
+    searched_count = 0
+    cache_hits = 0
+    dominance_hits = 0
+    greedy_hits = 0
+    greedy_stats = {"tried": 0, "seconds": 0.0}
+    undecided = []
+    # Regions searched at least once, so retries are not counted twice
+    searched = set()
+    
+    dominance = DominanceIndex(all_orientations)
+    
+    cache = None
+    if cache_path is not None:
+        cache = ResultCache(cache_path, cache_max_entries)
+    
+    def record(region_idx: int, verdict: Verdict, tier: Optional[str],
+               certificate: Optional[list] = None):
+        nonlocal solvable_count, searched_count, cache_hits, dominance_hits, greedy_hits
+        dominance.add(*regions[region_idx], verdict, certificate)
+        if verdict is Verdict.YES:
+            solvable_count += 1
+        elif verdict is Verdict.UNKNOWN:
+            undecided.append(region_idx)
+        if tier is None:
+            if region_idx not in searched:
+                searched.add(region_idx)
+                searched_count += 1
+        elif tier == "cache":
+            cache_hits += 1
+        elif tier == "dominance":
+            dominance_hits += 1
+        elif tier == "greedy":
+            greedy_hits += 1
+        elif tier in triage_counts:
+            triage_counts[tier] += 1
+    
+    # Placement tables are shared by regions with the same dimensions, up
+    # to PLACEMENT_TABLE_LIMIT of them
+    placement_tables = OrderedDict()
+    
+    def run_pass(pool, indices: List[int], time_limit: Optional[float],
+                 node_limit: Optional[int], greedy: bool):
+        if pool is None:
+            for region_idx in indices:
+                width, height, counts = regions[region_idx]
+                certificate = []
+                verdict, tier = check_region(
+                    region_idx + 1, total_regions, width, height, counts,
+                    all_orientations, engine, triage, placement_tables,
+                    time_limit, node_limit, cache, dominance, certificate,
+                    options, greedy, greedy_stats)
+                record(region_idx, verdict, tier, certificate or None)
+            return
+        
+        # Tasks are handed out one per worker, so that regions implied by
+        # ones decided in the meantime can be answered here from the
+        # parent's DominanceIndex instead of going to a worker
+        outputs = {}
+        printed = 0
+        
+        def finish(region_idx: int, verdict: Verdict, tier: Optional[str], output: str,
+                   certificate: Optional[list], stats: Dict):
+            nonlocal printed
+            record(region_idx, verdict, tier, certificate)
+            for key, value in stats.items():
+                greedy_stats[key] += value
+            if not ordered:
+                print(output, end="", flush=True)
+                return
+            outputs[region_idx] = output
+            while printed < len(indices) and indices[printed] in outputs:
+                print(outputs.pop(indices[printed]), end="", flush=True)
+                printed += 1
+        
+        in_flight = set()
+        for region_idx in indices:
+            width, height, counts = regions[region_idx]
+            if dominance.query(width, height, counts) is not None:
+                buffer = io.StringIO()
+                certificate = []
+                with contextlib.redirect_stdout(buffer):
+                    verdict, tier = check_region(
+                        region_idx + 1, total_regions, width, height, counts,
+                        all_orientations, engine, triage, placement_tables,
+                        time_limit, node_limit, cache, dominance, certificate,
+                        options, greedy, greedy_stats)
+                finish(region_idx, verdict, tier, buffer.getvalue(), certificate or None, {})
+                continue
+            
+            while len(in_flight) >= jobs:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(*future.result())
+            in_flight.add(pool.submit(check_region_worker, (
+                region_idx, total_regions, width, height, counts, time_limit, node_limit,
+                greedy)))
+        for future in as_completed(in_flight):
+            finish(*future.result())
+    
+    def run_all(pool):
+        nonlocal time_limit, node_limit
+        run_pass(pool, list(range(total_regions)), time_limit, node_limit, greedy)
+        
+        for attempt in range(retries):
+            if not undecided or (time_limit is None and node_limit is None):
+                break
+            if time_limit is not None:
+                time_limit *= retry_scale
+            if node_limit is not None:
+                node_limit = int(node_limit * retry_scale)
+            
+            log("=" * 60)
+            log(f"RETRYING {len(undecided)} UNDECIDED REGIONS "
+                f"(round {attempt + 1}, budget x{retry_scale ** (attempt + 1):g})...")
+            log("=" * 60)
+            log()
+            indices = sorted(undecided)
+            undecided.clear()
+            # The greedy pass would fail the same way again
+            run_pass(pool, indices, time_limit, node_limit, False)
+    
+    if jobs > 1:
+        log(f"  Solving with {jobs} worker processes "
+            f"({'input order' if ordered else 'as completed'})...")
+        log()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(all_orientations, engine, triage,
+                                           cache_path, cache_max_entries,
+                                           atlas_path, options)) as pool:
+            run_all(pool)
+    else:
+        run_all(None)
+    
+    # Final summary
+    log("=" * 60)
+    log("FINAL RESULTS")
+    log("=" * 60)
+    log(f"  Regions that CAN fit all shapes: {solvable_count} / {total_regions}")
+    tier_summary = ", ".join(f"{name} {count}" for name, count in triage_counts.items())
+    log(f"  Decided by triage: {tier_summary}; dominance: {dominance_hits}; "
+        f"greedy: {greedy_hits}; searched: {searched_count}")
+    if greedy_stats["tried"]:
+        log(f"  Greedy pre-pass: packed {greedy_hits} of {greedy_stats['tried']} regions "
+            f"({greedy_hits / greedy_stats['tried']:.0%}) in {greedy_stats['seconds']:.3f}s")
+    if cache is not None:
+        log(f"  Result cache hits: {cache_hits}")
+    if undecided:
+        undecided_nums = ", ".join(str(region_idx + 1) for region_idx in sorted(undecided))
+        log(f"  Undecided (no verdict from the search): {len(undecided)} - regions {undecided_nums}")
+    log()
+    log("=" * 60)
+    log(f"ANSWER: {solvable_count}")
+    log("=" * 60)
+    log()
+    
+    return solvable_count
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Main entry point for command-line usage.
+    """
+    parser = argparse.ArgumentParser(description="Elf present fitting puzzle solver")
+    parser.add_argument("input_file", nargs="?", default="day_twelve_input.txt",
+                        help="puzzle input (default: day_twelve_input.txt, '-' for stdin)")
+    parser.add_argument("--engine", default="auto",
+                        choices=sorted(ENGINES) + ["auto"],
+                        help="search engine for regions triage cannot decide")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--as-completed", action="store_true",
+                        help="with --jobs, print regions as they finish "
+                             "instead of in input order")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="seconds of search per region before giving up")
+    parser.add_argument("--node-limit", type=int, default=None,
+                        help="placement attempts per region before giving up")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="retry undecided regions this many times with "
+                             "10x the budget each round")
+    parser.add_argument("--restarts", action="store_true",
+                        help="search with randomized restarts on a Luby schedule "
+                             "(bitboard engine; auto then uses it for every region)")
+    parser.add_argument("--backjump", action="store_true",
+                        help="backjump on conflicts and learn nogoods, which "
+                             "--restarts carries from run to run (bitboard engine, "
+                             "as with --restarts)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for --restarts and the anneal engine "
+                             "(default: 0)")
+    parser.add_argument("--no-greedy", action="store_true",
+                        help="search every region triage leaves, without "
+                             "trying a greedy packing first")
+    parser.add_argument("--cache", default=None, metavar="PATH",
+                        help="SQLite file for caching searched verdicts across runs")
+    parser.add_argument("--cache-max-entries", type=int, default=100_000,
+                        help="evict least recently used verdicts beyond this many")
+    parser.add_argument("--atlas", default=None, metavar="PATH",
+                        help="rectangle atlas file for the atlas engine")
+    parser.add_argument("--build-atlas", default=None, metavar="PATH",
+                        help="build a rectangle atlas for the input's shapes, "
+                             "write it to PATH and exit")
+    parser.add_argument("--atlas-size", type=int, default=16,
+                        help="largest rectangle side in a built atlas (default: 16)")
+    args = parser.parse_args(argv)
+    if (args.restarts or args.backjump) and args.engine not in ("auto", "bitboard"):
+        parser.error("--restarts and --backjump need --engine bitboard or auto")
+    
+    # Read input
+    if args.input_file == "-":
+        log("Reading input from stdin...")
+        text = sys.stdin.read()
+    else:
+        log(f"Reading input from: {args.input_file}")
+        with open(args.input_file, 'r') as f:
+            text = f.read()
+    
+    if args.build_atlas is not None:
+        shapes_raw, _ = parse_input(text)
+        all_orientations = {shape_id: get_all_orientations(shape_to_coords(shape_lines))
+                            for shape_id, shape_lines in shapes_raw.items()}
+        log(f"Building rectangle atlas up to {args.atlas_size}x{args.atlas_size}...")
+        start = time.time()
+        fronts = build_atlas(all_orientations, args.atlas_size)
+        write_atlas(args.build_atlas, all_orientations, args.atlas_size, fronts)
+        log(f"Wrote {args.build_atlas} ({sum(map(len, fronts.values()))} vectors) "
+            f"in {time.time() - start:.1f}s")
+        return
+    
+    result = solve(text, engine=args.engine, jobs=args.jobs,
+                   ordered=not args.as_completed, time_limit=args.time_limit,
+                   node_limit=args.node_limit, retries=args.retries,
+                   cache_path=args.cache, cache_max_entries=args.cache_max_entries,
+                   atlas_path=args.atlas,
+                   options=SearchOptions(backjump=args.backjump, restarts=args.restarts,
+                                         seed=args.seed),
+                   greedy=not args.no_greedy)
+    
+    # Also print just the number for easy parsing
+    print(result)
+
+
+if __name__ == "__main__":
+    # Uses day_twelve_input.txt unless another input file is given
+    main()